@@ -0,0 +1,64 @@
+"""
+Compare the fast Atom serializer with feedgen on feeds of 50 to 500 entries.
+
+    python -m benchmarks.bench_serializer
+"""
+
+import os
+import timeit
+from datetime import UTC, datetime, timedelta
+
+os.environ.setdefault("IG_USERNAME", "benchmark")
+os.environ.setdefault("IG_PASSWORD", "benchmark")
+
+from instagram_rss import serializer
+from instagram_rss.serializer import Entry, Feed
+
+SIZES = (50, 100, 250, 500)
+CAPTION = 'A caption with <html> & "quotes", #hashtags and @mentions 🐈\n' * 5
+
+
+def make_feed(entries: int) -> Feed:
+    date = datetime(2024, 1, 1, tzinfo=UTC)
+    return Feed(
+        id="https://www.instagram.com/user",
+        title="user",
+        description=CAPTION,
+        link="https://www.instagram.com/user",
+        image="https://cdn.example/pic.jpg?a=1&b=2",
+        updated=date,
+        entries=[
+            Entry(
+                id=f"https://www.instagram.com/p/{i}/",
+                link=f"https://www.instagram.com/p/{i}/",
+                author="user",
+                title=f"user post: {CAPTION[:100]}...",
+                content=f'<a href="https://www.instagram.com/user">@user</a><br>{CAPTION}'
+                + '<br><br><img src="https://cdn.example/1.jpg?stp=dst-jpg&_nc_ht=x&oh=y&oe=z"/>' * 3,
+                published=date - timedelta(hours=i),
+                source_url=f"https://www.instagram.com/p/{i}/",
+                source_title=CAPTION[:100],
+            )
+            for i in range(entries)
+        ],
+    )
+
+
+def measure(fn, number: int) -> float:
+    """Return the best milliseconds per call of 5 repeats."""
+    return min(timeit.repeat(fn, number=number, repeat=5)) / number * 1000
+
+
+def main():
+    print(f"{'entries':>8} {'feedgen ms':>11} {'fast ms':>8} {'speedup':>8} {'bytes':>9}")
+    for size in SIZES:
+        feed = make_feed(size)
+        number = max(1, 2000 // size)
+        feedgen_ms = measure(lambda feed=feed: serializer.feedgen_atom(feed), number)
+        fast_ms = measure(lambda feed=feed: "".join(serializer.iter_atom(feed)).encode(), number)
+        size_bytes = len("".join(serializer.iter_atom(feed)).encode())
+        print(f"{size:>8} {feedgen_ms:>11.2f} {fast_ms:>8.2f} {feedgen_ms / fast_ms:>7.1f}x {size_bytes:>9}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,267 @@
+"""
+Benchmark the feed service offline, against the Instagram stand-in of ``benchmarks.fake_instagram``.
+
+    python -m benchmarks.bench_service [--requests 50] [--concurrency 8] [--latency-ms 5]
+    python -m benchmarks.bench_service --json bench.json
+    python -m benchmarks.bench_service --baseline bench.json  # exits 1 on a regression, e.g. in CI
+
+The requests go straight into the ASGI app, with the scenarios:
+
+- cold: feeds of users never requested before, built from Instagram
+- warm: the cold feeds again, from the feed cache
+- rebuild: the cold feeds rebuilt after they left the feed cache, from their unchanged profiles
+- username: /instagram/{username} redirects of usernames never resolved before
+- username-known: the same usernames again, resolved from the state store
+- stories: feeds of only the stories of users with many stories
+- stories-prefetched: the stories feeds rebuilt after a run of the story prefetcher, whose requests they are
+  charged with
+- get_rss: InstagramUserRSS.get_rss, without the service around it
+
+Latencies and requests per second come from a first run of the suite. Peak memory comes from a second run with
+tracemalloc, whose overhead would skew the latencies.
+"""
+
+from __future__ import annotations
+import argparse
+import asyncio
+import json
+import logging
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from unittest import mock
+
+os.environ.setdefault("IG_USERNAME", "benchmark")
+os.environ.setdefault("IG_PASSWORD", "benchmark")
+os.environ["REDIS_URL"] = ""
+os.environ["REFRESH_BUDGET"] = "0"
+os.environ["STATE_DB_FILEPATH"] = str(Path(tempfile.mkdtemp()) / "state.sqlite3")
+
+from instaloader import Profile
+from benchmarks.fake_instagram import FakeInstagram, FakeInstaloader
+from instagram_rss import __main__ as service
+from instagram_rss.instagram_user_rss import InstagramUserRSS
+
+STORIES_HEAVY = 40
+
+
+@dataclass
+class Result:
+    scenario: str
+    requests: int
+    p50_ms: float
+    p99_ms: float
+    rps: float
+    upstream_per_feed: float
+    peak_kib: float = 0.0
+
+
+def percentile(values: list[float], fraction: float) -> float:
+    values = sorted(values)
+    return values[min(len(values) - 1, round(fraction * (len(values) - 1)))]
+
+
+async def asgi_get(path: str) -> int:
+    """GET ``path`` from the app, returning the status code."""
+    path, _, query = path.partition("?")
+    scope = {
+        "type": "http",
+        "asgi": {"version": "3.0"},
+        "http_version": "1.1",
+        "method": "GET",
+        "scheme": "http",
+        "path": path,
+        "raw_path": path.encode(),
+        "query_string": query.encode(),
+        "root_path": "",
+        "headers": [(b"accept-encoding", b"gzip")],
+        "client": ("127.0.0.1", 0),
+        "server": ("127.0.0.1", 8000),
+    }
+    response_status = 0
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        nonlocal response_status
+        if message["type"] == "http.response.start":
+            response_status = message["status"]
+
+    await service.app(scope, receive, send)
+    return response_status
+
+
+class Benchmark:
+    def __init__(self, instagram: FakeInstagram, requests: int, concurrency: int):
+        self.instagram = instagram
+        self.requests = requests
+        self.concurrency = concurrency
+
+    async def measure(self, scenario: str, paths: list[str], expected_status: int) -> Result:
+        semaphore = asyncio.Semaphore(self.concurrency)
+        latencies = []
+
+        async def request(path: str):
+            async with semaphore:
+                started = time.perf_counter()
+                response_status = await asgi_get(path)
+                latencies.append(time.perf_counter() - started)
+            assert response_status == expected_status, f"{scenario} {path}: {response_status}"
+
+        calls = self.instagram.calls
+        started = time.perf_counter()
+        await asyncio.gather(*[request(_) for _ in paths])
+        elapsed = time.perf_counter() - started
+        return Result(
+            scenario=scenario,
+            requests=len(paths),
+            p50_ms=percentile(latencies, 0.5) * 1000,
+            p99_ms=percentile(latencies, 0.99) * 1000,
+            rps=len(paths) / elapsed,
+            upstream_per_feed=(self.instagram.calls - calls) / len(paths),
+        )
+
+    async def measure_get_rss(self, users: range) -> Result:
+        instaloader = FakeInstaloader(self.instagram)
+        latencies = []
+        calls = self.instagram.calls
+        started = time.perf_counter()
+        for userid in users:
+            request_started = time.perf_counter()
+            profile = await asyncio.to_thread(Profile.from_id, instaloader.context, userid)
+            await asyncio.to_thread(InstagramUserRSS(profile, instaloader).get_rss)
+            latencies.append(time.perf_counter() - request_started)
+        elapsed = time.perf_counter() - started
+        return Result(
+            scenario="get_rss",
+            requests=len(users),
+            p50_ms=percentile(latencies, 0.5) * 1000,
+            p99_ms=percentile(latencies, 0.99) * 1000,
+            rps=len(users) / elapsed,
+            upstream_per_feed=(self.instagram.calls - calls) / len(users),
+        )
+
+    async def run(self, first_userid: int, *, trace_memory: bool = False) -> list[Result]:
+        n = self.requests
+        cold = [f"/instagram/{_}" for _ in range(first_userid, first_userid + n)]
+        usernames = [f"/instagram/{FakeInstagram.username(_)}" for _ in range(first_userid + n, first_userid + 2 * n)]
+        stories = [
+            f"/instagram/{_}?posts=0&reels=0&stories=1" for _ in range(first_userid + 2 * n, first_userid + 3 * n)
+        ]
+        scenarios = [
+            ("cold", cold, 200),
+            ("warm", cold, 200),
+            ("rebuild", cold, 200),
+            ("username", usernames, 302),
+            ("username-known", usernames, 302),
+            ("stories", stories, 200),
+            ("stories-prefetched", stories, 200),
+        ]
+
+        results = []
+        stories_per_user = self.instagram.stories
+        for scenario, paths, expected_status in scenarios:
+            self.instagram.stories = STORIES_HEAVY if scenario.startswith("stories") else stories_per_user
+            if scenario in {"rebuild", "stories-prefetched"}:
+                await service.cache.clear()
+            prefetch_calls = self.instagram.calls
+            if scenario == "stories-prefetched":
+                await service.story_prefetcher.prefetch()
+            prefetch_calls = self.instagram.calls - prefetch_calls
+            if trace_memory:
+                tracemalloc.reset_peak()
+            results.append(await self.measure(scenario, paths, expected_status))
+            results[-1].upstream_per_feed += prefetch_calls / len(paths)
+            if trace_memory:
+                results[-1].peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+        self.instagram.stories = stories_per_user
+
+        if trace_memory:
+            tracemalloc.reset_peak()
+        results.append(await self.measure_get_rss(range(first_userid + 3 * n, first_userid + 4 * n)))
+        if trace_memory:
+            results[-1].peak_kib = tracemalloc.get_traced_memory()[1] / 1024
+        return results
+
+
+async def run_suite(requests: int, concurrency: int, latency: float) -> list[Result]:
+    instagram = FakeInstagram(latency=latency)
+    benchmark = Benchmark(instagram, requests=requests, concurrency=concurrency)
+    with mock.patch.object(service.sessions, "start"):
+        for session in service.sessions.sessions:
+            session.instaloader = FakeInstaloader(instagram)
+            session.valid = True
+            session.last_check = time.time()
+
+        async with service.lifespan(service.app):
+            results = await benchmark.run(first_userid=1_000_000)
+
+            tracemalloc.start()
+            try:
+                memory_results = await benchmark.run(first_userid=2_000_000, trace_memory=True)
+            finally:
+                tracemalloc.stop()
+
+    for result, memory_result in zip(results, memory_results, strict=True):
+        result.peak_kib = memory_result.peak_kib
+    return results
+
+
+def regressions(results: list[Result], baseline: list[dict], tolerance: float) -> list[str]:
+    """
+    Compare with a baseline saved by --json. Upstream calls are deterministic and must not grow at all,
+    the latencies may grow by ``tolerance`` and the requests per second drop by it.
+    """
+    result = []
+    by_scenario = {_.scenario: _ for _ in results}
+    for expected in baseline:
+        actual = by_scenario.get(expected["scenario"])
+        if actual is None:
+            continue
+        if actual.upstream_per_feed > expected["upstream_per_feed"]:
+            result.append(f"{actual.scenario}: {actual.upstream_per_feed} > {expected['upstream_per_feed']} calls")
+        if actual.p50_ms > expected["p50_ms"] * (1 + tolerance):
+            result.append(f"{actual.scenario}: p50 {actual.p50_ms:.1f} > {expected['p50_ms']:.1f} ms")
+        if actual.rps < expected["rps"] / (1 + tolerance):
+            result.append(f"{actual.scenario}: {actual.rps:.1f} < {expected['rps']:.1f} requests/s")
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=8, help="requests in flight at once")
+    parser.add_argument("--latency-ms", type=float, default=5, help="latency of every request to Instagram")
+    parser.add_argument("--json", type=Path, help="save the results to this file")
+    parser.add_argument("--baseline", type=Path, help="fail on a regression against the results in this file")
+    parser.add_argument("--tolerance", type=float, default=0.5, help="latency and throughput regression allowed")
+    parser.add_argument("--log", action="store_true", help="keep the INFO logs of the service")
+    args = parser.parse_args()
+    if not args.log:
+        logging.disable(logging.INFO)
+
+    results = asyncio.run(run_suite(args.requests, args.concurrency, args.latency_ms / 1000))
+    print(f"{'scenario':<18} {'requests':>8} {'p50 ms':>8} {'p99 ms':>8} {'req/s':>8} {'upstream':>8} {'peak KiB':>9}")
+    for r in results:
+        print(
+            f"{r.scenario:<18} {r.requests:>8} {r.p50_ms:>8.1f} {r.p99_ms:>8.1f} {r.rps:>8.1f}"
+            f" {r.upstream_per_feed:>8.1f} {r.peak_kib:>9.0f}",
+        )
+
+    if args.json:
+        args.json.write_text(json.dumps([asdict(_) for _ in results], indent=2))
+    if args.baseline:
+        failures = regressions(results, json.loads(args.baseline.read_text()), args.tolerance)
+        for failure in failures:
+            print(f"regression: {failure}")
+        if failures:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,292 @@
+"""
+Stand-in for Instagram behind the Instaloader the service uses, for benchmarks without network access.
+
+``FakeContext`` replaces the InstaloaderContext of a real Instaloader and answers its queries with responses
+shaped like Instagram's, so the real Profile, NodeIterator, Post, Story and StoryItem code makes the requests
+it makes against Instagram: two to resolve a user id, the profile metadata, every page of 12 posts or tagged posts,
+the pages of the reels and the metadata of every reel, the full metadata of posts, the iPhone API lookups,
+and the stories query per 50 users, with the iPhone API lookup of the stories of every user.
+
+Profiles, posts and stories are generated deterministically from the user id. Every request is counted in
+``FakeInstagram.calls`` and takes ``latency`` seconds. The HEAD requests of the video URL candidates go to the CDN,
+so they take ``latency`` seconds without being counted.
+"""
+
+from __future__ import annotations
+import re
+import threading
+import time
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from instaloader import Instaloader, Post
+from instagram_rss import metrics
+
+PAGE_LENGTH = 12
+STORIES_PER_QUERY = 50
+SIDECAR_LENGTH = 4
+SIDECAR_VIDEOS = (2,)  # the indexes of the videos among the sidecar media
+CAPTION = "Sunset over the bay 🌅 with @friend & co. <3\n#travel #photography #nofilter\n"
+EPOCH = datetime(2024, 1, 1, tzinfo=UTC)
+SECTIONS = ("posts", "reels", "tagged")
+IMAGE, VIDEO, SIDECAR = 1, 2, 8  # the media types of the iPhone API
+MEDIA_TYPES = (IMAGE, SIDECAR, VIDEO)
+
+PROFILE_DOC_ID = "27937681195819736"
+POSTS_DOC_ID = "28975909992013618"
+REELS_DOC_ID = "7845543455542541"
+POST_DOC_ID = "27128499623469141"
+TAGGED_QUERY_HASH = "e31a871f7301132ceaab56507a66bbb7"
+STORIES_QUERY_HASH = "303a4ae99711322310f25250d988f3b7"
+
+
+def cdn(name: str) -> str:
+    return f"https://scontent.cdninstagram.com/v/{name}?stp=dst-jpg&_nc_ht=scontent&oh=00&oe=FF"
+
+
+class FakeInstagram:
+    def __init__(self, latency: float = 0.005, posts: int = 60, stories: int = 5):
+        self.latency = latency
+        self.posts = posts
+        self.stories = stories
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def request(self):
+        metrics.upstream_request("fake")  # like the SharedRateController of the real Instaloader
+        with self._lock:
+            self.calls += 1
+        self.wait()
+
+    def wait(self):
+        if self.latency:
+            time.sleep(self.latency)
+
+    @staticmethod
+    def username(userid: int) -> str:
+        return f"user{userid}"
+
+    @staticmethod
+    def userid(username: str) -> int | None:
+        username = username.strip("/")
+        return int(username[4:]) if username.startswith("user") and username[4:].isnumeric() else None
+
+    @staticmethod
+    def user(userid: int) -> dict:
+        username = FakeInstagram.username(userid)
+        return {
+            "pk": str(userid),
+            "id": str(userid),
+            "username": username,
+            "full_name": f"User {userid}",
+            "biography": f"Biography of {username} & friends",
+            "is_private": False,
+            "profile_pic_url": cdn(f"{username}.jpg"),
+            "profile_pic_url_hd": cdn(f"{username}_hd.jpg"),
+        }
+
+    # posts
+
+    @staticmethod
+    def pk(userid: int, section: str, index: int) -> int:
+        return (userid * len(SECTIONS) + SECTIONS.index(section)) * 1000 + index
+
+    @staticmethod
+    def post_of(pk: int) -> tuple[int, str, int]:
+        key, index = divmod(pk, 1000)
+        userid, section = divmod(key, len(SECTIONS))
+        return userid, SECTIONS[section], index
+
+    @staticmethod
+    def media_type(section: str, index: int) -> int:
+        return VIDEO if section == "reels" else MEDIA_TYPES[index % len(MEDIA_TYPES)]
+
+    def media(self, pk: int) -> dict:
+        """Return the media of the iPhone API, in the user timeline, the media info and the shortcode web info."""
+        userid, section, index = self.post_of(pk)
+        code = Post.mediaid_to_shortcode(pk)
+        media_type = self.media_type(section, index)
+        owner = self.user(userid if section != "tagged" else 10_000_000 + index)
+        media = {
+            "pk": pk,
+            "id": f"{pk}_{owner['pk']}",
+            "code": code,
+            "media_type": media_type,
+            "taken_at": int((EPOCH - timedelta(hours=index * 7)).timestamp()),
+            "caption": {"text": CAPTION * (1 + index % 4)},
+            "has_liked": False,
+            "like_count": index,
+            "comment_count": index,
+            "user": owner,
+            "image_versions2": {"candidates": [{"url": cdn(f"{code}.jpg")}]},
+        }
+        if index % 3:
+            media["usertags"] = {"in": [{"user": {"username": f"friend{_}"}} for _ in range(index % 3)]}
+        if media_type == VIDEO:
+            media["video_versions"] = [{"url": cdn(f"{code}.mp4")}]
+            media["view_count"] = index
+        if media_type == SIDECAR:
+            media["carousel_media"] = [
+                {
+                    "media_type": VIDEO if _ in SIDECAR_VIDEOS else IMAGE,
+                    "image_versions2": {"candidates": [{"url": cdn(f"{code}_{_}.jpg")}]},
+                    **({"video_versions": [{"url": cdn(f"{code}_{_}.mp4")}]} if _ in SIDECAR_VIDEOS else {}),
+                }
+                for _ in range(SIDECAR_LENGTH)
+            ]
+        return media
+
+    def graphql_node(self, pk: int) -> dict:
+        """Return the node of the graphql queries, e.g. of the tagged posts, in which sidecar videos lack their URL."""
+        media = self.media(pk)
+        typename = {IMAGE: "GraphImage", VIDEO: "GraphVideo", SIDECAR: "GraphSidecar"}[media["media_type"]]
+        node = {
+            "id": str(pk),
+            "shortcode": media["code"],
+            "__typename": typename,
+            "is_video": typename == "GraphVideo",
+            "taken_at_timestamp": media["taken_at"],
+            "display_url": cdn(f"{media['code']}_lq.jpg"),
+            "owner": {"id": media["user"]["pk"], "username": media["user"]["username"]},
+            "edge_media_to_caption": {"edges": [{"node": {"text": media["caption"]["text"]}}]},
+            "edge_media_to_tagged_user": {
+                "edges": [{"node": {"user": _["user"]}} for _ in media.get("usertags", {}).get("in", [])],
+            },
+        }
+        if typename == "GraphVideo":
+            node["video_url"] = cdn(f"{media['code']}_lq.mp4")
+        if typename == "GraphSidecar":
+            children = [
+                {"is_video": "video_versions" in _, "display_url": _["image_versions2"]["candidates"][0]["url"]}
+                for _ in media["carousel_media"]
+            ]
+            node["edge_sidecar_to_children"] = {"edges": [{"node": _} for _ in children]}
+        return node
+
+    def page(self, userid: int, section: str, after: str | None, wrap) -> dict:
+        start = int(after or 0)
+        end = min(start + PAGE_LENGTH, self.posts)
+        return {
+            "count": self.posts,
+            "edges": [{"node": wrap(self.pk(userid, section, _))} for _ in range(start, end)],
+            "page_info": {"has_next_page": end < self.posts, "end_cursor": str(end)},
+        }
+
+    # stories
+
+    def story_items(self, userid: int) -> list[dict]:
+        result = []
+        for index in range(self.stories):
+            mediaid = userid * 1000 + index
+            is_video = index % 2 == 1
+            item = {
+                "id": str(mediaid),
+                "__typename": "GraphStoryVideo" if is_video else "GraphStoryImage",
+                "is_video": is_video,
+                "taken_at_timestamp": int((EPOCH - timedelta(minutes=index * 30)).timestamp()),
+                "display_resources": [{"src": cdn(f"story{mediaid}_lq.jpg")}],
+                "owner": {"id": str(userid)},
+            }
+            if is_video:
+                item["video_resources"] = [{"src": cdn(f"story{mediaid}_lq.mp4")}]
+            result.append(item)
+        return result
+
+    def iphone_story_items(self, userid: int) -> list[dict]:
+        return [
+            {
+                "pk": int(_["id"]),
+                "image_versions2": {"candidates": [{"url": cdn(f"story{_['id']}.jpg")}]},
+                **({"video_versions": [{"url": cdn(f"story{_['id']}.mp4")}]} if _["is_video"] else {}),
+            }
+            for _ in self.story_items(userid)
+        ]
+
+
+class FakeContext:
+    """Answers the queries of Instaloader like a logged-in InstaloaderContext with iPhone support."""
+
+    iphone_support = True
+    is_logged_in = True
+    username = "benchmark"
+
+    def __init__(self, instagram: FakeInstagram):
+        self.instagram = instagram
+        self.profile_id_cache = {}
+        self.errors = []
+
+    def error(self, msg: str, *_args, **_kwargs):
+        self.errors.append(msg)
+
+    def log(self, *msg, sep: str = "", end: str = "\n", flush: bool = False):
+        pass
+
+    def test_login(self) -> str:
+        return self.username
+
+    def get_json(self, path: str, *_args, **_kwargs) -> dict:
+        self.instagram.request()
+        match = re.fullmatch(r"api/v1/users/(\d+)/info/", path)
+        assert match, path
+        return {"user": {"pk": match[1], "username": FakeInstagram.username(int(match[1]))}}
+
+    def get_page_data(self, path: str, *_args, **_kwargs) -> list[dict]:
+        self.instagram.request()
+        userid = FakeInstagram.userid(path)
+        if userid is None:
+            return []
+        user = FakeInstagram.user(userid)
+        del user["profile_pic_url_hd"], user["id"]  # not on the profile page
+        return [{"xig_user_by_username": user}]
+
+    def doc_id_graphql_query(self, doc_id: str, variables: dict, *_args, **_kwargs) -> dict:
+        self.instagram.request()
+        instagram = self.instagram
+        after = variables.get("after")
+        if doc_id == PROFILE_DOC_ID:
+            return {"data": {"user": FakeInstagram.user(int(variables["id"])) | {"followed_by_viewer": True}}}
+        if doc_id == POSTS_DOC_ID:
+            userid = FakeInstagram.userid(variables["username"])
+            page = instagram.page(userid, "posts", after, instagram.media)
+            return {"data": {"xdt_api__v1__feed__user_timeline_graphql_connection": page}}
+        if doc_id == REELS_DOC_ID:
+            userid = int(variables["data"]["target_user_id"])
+            page = instagram.page(userid, "reels", after, lambda pk: {"media": {"code": Post.mediaid_to_shortcode(pk)}})
+            return {"data": {"xdt_api__v1__clips__user__connection_v2": page}}
+        if doc_id == POST_DOC_ID:
+            media = instagram.media(Post.shortcode_to_mediaid(variables["shortcode"]))
+            return {"data": {"xdt_api__v1__media__shortcode__web_info": {"items": [media]}}}
+        raise AssertionError(doc_id)
+
+    def graphql_query(self, query_hash: str, variables: dict, *_args, **_kwargs) -> dict:
+        self.instagram.request()
+        instagram = self.instagram
+        if query_hash == TAGGED_QUERY_HASH:
+            page = instagram.page(int(variables["id"]), "tagged", variables.get("after"), instagram.graphql_node)
+            return {"data": {"user": {"edge_user_to_photos_of_you": page}}}
+        if query_hash == STORIES_QUERY_HASH:
+            reels = [
+                {"id": str(_), "user": FakeInstagram.user(int(_)), "items": instagram.story_items(int(_))}
+                for _ in variables["reel_ids"]
+                if instagram.stories
+            ]
+            return {"data": {"reels_media": reels}}
+        raise AssertionError(query_hash)
+
+    def get_iphone_json(self, path: str, params: dict) -> dict:  # noqa: ARG002
+        self.instagram.request()
+        if match := re.fullmatch(r"api/v1/media/(\d+)/info/", path):
+            return {"items": [self.instagram.media(int(match[1]))]}
+        if match := re.fullmatch(r"api/v1/feed/reels_media/\?reel_ids=(\d+)", path):
+            return {"reels": {match[1]: {"items": self.instagram.iphone_story_items(int(match[1]))}}}
+        raise AssertionError(path)
+
+    def head(self, url: str, *_args, **_kwargs) -> SimpleNamespace:
+        self.instagram.wait()
+        return SimpleNamespace(headers={"Content-Length": str(len(url))})
+
+
+class FakeInstaloader(Instaloader):
+    def __init__(self, instagram: FakeInstagram):
+        super().__init__(quiet=True)
+        self.context.close()
+        self.context = FakeContext(instagram)
@@ -1,56 +1,152 @@
 from __future__ import annotations
-import time
-from pathlib import Path
-from typing import Annotated
-
-from fastapi import FastAPI, status, Response, Query
-from fastapi.responses import RedirectResponse
-from instaloader import Instaloader, TwoFactorAuthRequiredException, Profile, ProfileNotExistsException
+import asyncio
+import hashlib
+from contextlib import asynccontextmanager
+from email.utils import formatdate
+from functools import partial
+from typing import TYPE_CHECKING, Annotated, Literal
+
+from fastapi import FastAPI, status, Request, Response, Query
+from fastapi.responses import FileResponse, RedirectResponse
+from instaloader import (
+    AbortDownloadException,
+    Instaloader,
+    LoginRequiredException,
+    Profile,
+    ProfileNotExistsException,
+)
 from pydantic import BaseModel
 from global_logger import Log
-from pyotp import TOTP
-import shutil
 from aiocache import Cache
-from asyncio.exceptions import TimeoutError  # noqa: A004
-from instagram_rss import env, tools
-from instagram_rss.instagram_user_rss import InstagramUserRSS
+from aiocache.serializers import PickleSerializer
+from instagram_rss import env, metrics, serializer, tools
+from instagram_rss.exceptions import NoSessionAvailableError
+from instagram_rss.instagram_user_rss import BASE_URL, InstagramUserRSS, fetch_stories
+from instagram_rss.item_cache import ItemCache
+from instagram_rss.media import MediaCacheStats, MediaProxy, load_secret
+from instagram_rss.memory_cache import BoundedMemoryCache, MemoryCacheStats
+from instagram_rss.models import CachedFeed
+from instagram_rss.rate_limiter import RateLimiterStats, RedisTokenBucket, SharedRateController, TokenBucket
+from instagram_rss.refresher import FeedRefresher, HotFeed
+from instagram_rss.scraper import ScrapeExecutor, ScrapeExecutorStats
+from instagram_rss.sessions import SessionPool, SessionStats, accounts_from_env
+from instagram_rss.singleflight import SingleFlight
+from instagram_rss.stories import StoryPrefetcher
+from instagram_rss.state import PROFILE_NOT_EXISTS, StateStore
+from instagram_rss.tiered_cache import CircuitBreaker, CircuitBreakerStats, TieredCache
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
 
 LOG = Log.get_logger()
-app = FastAPI()
+scraper = ScrapeExecutor(max_workers=env.SCRAPE_WORKERS)
+
+
+@asynccontextmanager
+async def lifespan(_app: FastAPI):
+    item_cache.bind(asyncio.get_running_loop())
+    sessions.start()
+    refresher.start()
+    story_prefetcher.start()
+    yield
+    for task in background_builds.values():
+        task.cancel()
+    await story_prefetcher.stop()
+    await refresher.stop()
+    await sessions.stop()
+    scraper.shutdown()
+
+
+app = FastAPI(lifespan=lifespan)
+
 
-memory_cache = Cache.from_url("memory://")
-memory_cache.ttl = env.CACHE_DURATION
-memory_cache.timeout = 15
+app.add_middleware(metrics.TraceMiddleware, slow_request_seconds=env.SLOW_REQUEST_SECONDS)
+
+
+# feeds are kept for STALE_DURATION after they expire, to be served while they are being rebuilt.
+# In memory, and with redis in redis too, in front of which the memory serves as a read-through cache
+redis_breaker = CircuitBreaker(max_failures=env.REDIS_FAILURES, cooldown=env.REDIS_COOLDOWN)
+memory_cache = BoundedMemoryCache(
+    max_entries=env.MAX_CACHE_SIZE,
+    max_bytes=env.MAX_CACHE_BYTES,
+    ttl=env.CACHE_DURATION + env.STALE_DURATION,
+)
+if env.REDIS_URL:
+    redis_cache = Cache.from_url(env.REDIS_URL)
+    redis_cache.ttl = env.CACHE_DURATION + env.STALE_DURATION
+    redis_cache.timeout = env.REDIS_TIMEOUT
+    redis_cache.serializer = PickleSerializer()
+    redis_cache.namespace = "feed:gz:"  # keeps the compressed feeds apart from the ones cached by older versions
+else:
+    redis_cache = None
+cache = TieredCache(memory_cache, redis_cache, redis_breaker, l1_ttl=env.CACHE_L1_DURATION, name="feed")
+
+# extracted posts and story items, shared by all feeds and parameter combinations
+item_memory_cache = BoundedMemoryCache(
+    max_entries=env.ITEM_CACHE_SIZE,
+    max_bytes=env.MAX_CACHE_BYTES,
+    ttl=env.ITEM_CACHE_DURATION,
+)
+if env.REDIS_URL:
+    item_redis_cache = Cache.from_url(env.REDIS_URL)
+    item_redis_cache.ttl = env.ITEM_CACHE_DURATION
+    item_redis_cache.timeout = env.REDIS_TIMEOUT
+    item_redis_cache.serializer = PickleSerializer()
+    item_redis_cache.namespace = "item:"
+else:
+    item_redis_cache = None
+item_cache = ItemCache(
+    TieredCache(item_memory_cache, item_redis_cache, redis_breaker, l1_ttl=env.ITEM_CACHE_DURATION, name="item"),
+)
 
+# shared by every Instaloader request, and by all replicas with redis
 if env.REDIS_URL:
-    cache = Cache.from_url(env.REDIS_URL or "memory://")
-    cache.ttl = env.CACHE_DURATION
-    cache.timeout = 15
+    rate_limiter = RedisTokenBucket(env.REDIS_URL, rate_per_minute=env.IG_RATE_LIMIT, burst=env.IG_RATE_BURST)
 else:
-    cache = memory_cache
+    rate_limiter = TokenBucket(rate_per_minute=env.IG_RATE_LIMIT, burst=env.IG_RATE_BURST)
+
+state = StateStore(
+    env.STATE_DB_FILEPATH,
+    username_duration=env.USERNAME_CACHE_DURATION,
+    username_not_found_duration=env.USERNAME_NOT_FOUND_DURATION,
+)
+media_proxy = (
+    MediaProxy(
+        env.MEDIA_PROXY_URL,
+        secret=env.MEDIA_PROXY_SECRET or load_secret(env.MEDIA_PROXY_SECRET_FILEPATH),
+        dirpath=env.MEDIA_CACHE_DIRPATH,
+        max_bytes=env.MEDIA_CACHE_BYTES,
+    )
+    if env.MEDIA_PROXY_URL
+    else None
+)
+singleflight = SingleFlight(redis_url=env.REDIS_URL, lock_timeout=env.REDIS_LOCK_TIMEOUT)
 
-instaloader_instance = None
-last_login_check_time = 0
 LOGIN_CHECK_INTERVAL = 60 * 60
+MEDIA_ATTEMPTS = 2
+SESSION_ERRORS = (LoginRequiredException, AbortDownloadException)  # logged out or challenged by Instagram
+sessions = SessionPool(
+    accounts_from_env(),
+    rate_controller=lambda context: SharedRateController(context, rate_limiter),
+    login_check_interval=LOGIN_CHECK_INTERVAL,
+    quarantine=env.SESSION_QUARANTINE,
+)
 
 
 class HealthCheck(BaseModel):
     status: str = "OK"
-
-
-async def get_cached_item(key: str) -> str | None:
-    try:
-        cached_data = await cache.get(key)
-        LOG.debug(f"Returning cached response for {key}")
-    except TimeoutError as e:
-        LOG.error(f"{type(e)} while retrieving cached item")  # noqa: TRY400
-        try:
-            cached_data = await memory_cache.get(key)
-            LOG.debug(f"Returning cached response for {key} from memory")
-        except TimeoutError as e:
-            LOG.error(f"{type(e)} while retrieving cached item frrom memory")  # noqa: TRY400
-            cached_data = None
-
+    scraper: ScrapeExecutorStats | None = None
+    rate_limiter: RateLimiterStats | None = None
+    sessions: list[SessionStats] | None = None
+    memory_cache: MemoryCacheStats | None = None
+    item_memory_cache: MemoryCacheStats | None = None
+    redis: CircuitBreakerStats | None = None
+    media_cache: MediaCacheStats | None = None
+
+
+async def get_cached_item(key: str, *, skip_l1: bool = False) -> CachedFeed | None:
+    with metrics.stage("cache_get"):
+        cached_data = await cache.get(key, skip_l1=skip_l1)
     if cached_data:
         LOG.debug(f"Returning cached response for {key}")
     else:
@@ -58,69 +154,231 @@ async def get_cached_item(key: str) -> str | None:
     return cached_data
 
 
-async def set_cached_item(key: str, value: str):
-    try:
+async def set_cached_item(key: str, value: CachedFeed):
+    with metrics.stage("cache_set"):
         await cache.set(key, value)
-        LOG.debug(f"Cached {key}")
-    except TimeoutError as e:
-        LOG.error(f"{type(e)} while caching item.")  # noqa: TRY400
-        try:
-            await memory_cache.set(key, value)
-            LOG.debug(f"Cached {key} to memory")
-        except TimeoutError as e:
-            LOG.error(f"{type(e)} while caching item to memory.")  # noqa: TRY400
-            return
-
     LOG.debug(f"Cached {key}")
 
 
-def get_instaloader() -> Instaloader:
-    """Get a singleton instance of Instaloader with periodic login validation."""
-    global instaloader_instance, last_login_check_time  # noqa: PLW0603
-
-    if instaloader_instance is None:
-        instaloader_instance = Instaloader(max_connection_attempts=5)
-
-    # Only revalidate login if interval has expired
-    current_time = time.time()
-    if current_time - last_login_check_time > LOGIN_CHECK_INTERVAL:
-        logged_in = False
-        LOG.green("Logging in")
-        session_file = Path(env.IG_SESSION_FILEPATH)
-        if session_file.exists():
-            LOG.green("Using the saved session")
-            instaloader_instance.load_session_from_file(env.IG_USERNAME, str(session_file))
-            logged_in = instaloader_instance.test_login()
-            if not logged_in:
-                LOG.red("Session is invalid. Removing the saved session")
-                shutil.move(str(session_file), str(session_file) + ".bak")
-
-        if not logged_in:
-            LOG.green("Logging in from scratch")
-            try:
-                instaloader_instance.login(env.IG_USERNAME, env.IG_PASSWORD)
-            except TwoFactorAuthRequiredException:
-                totp = TOTP(env.IG_OTP)
-                otp = totp.now()
-                instaloader_instance.two_factor_login(otp)
-            except Exception:
-                LOG.exception("Error logging in. Check password")
-                raise
+@asynccontextmanager
+async def instaloader_session() -> AsyncIterator[Instaloader]:
+    """
+    Check out a logged-in Instaloader from the session pool for the duration of the block,
+    waiting up to ``SESSION_WAIT`` seconds for the first logins after a start.
+    """
+    with metrics.stage("session"):
+        await sessions.ready(env.SESSION_WAIT)
+        session = sessions.acquire()
+    try:
+        yield session.instaloader
+    except SESSION_ERRORS:
+        sessions.quarantine(session)
+        raise
+    finally:
+        sessions.release(session)
+
+
+async def build_feed(cache_key: str, user_id: str, options: dict, *, dry_run: bool = False) -> CachedFeed:
+    """Scrape and cache a feed. Concurrent cold requests for the same cache_key share one build."""
+    async with singleflight.lock(cache_key) as waited:
+        # from redis, where another replica that held the lock meanwhile put the feed it built
+        cached_response = await get_cached_item(cache_key, skip_l1=True)
+        if waited and cached_response and cached_response.is_fresh:
+            return cached_response  # another replica built it while we were waiting for the lock
+
+        with metrics.trace(new=True) as trace:
+            async with instaloader_session() as il:
+                profile = await scraper.run(metrics.timed("profile", Profile.from_id), il.context, user_id)
+                rss = InstagramUserRSS(
+                    profile=profile,
+                    il=il,
+                    item_cache=item_cache,
+                    state=state,
+                    media_proxy=media_proxy,
+                )
+                rss_content = await rss.get_rss_async(
+                    scraper.run,
+                    concurrency=env.SECTION_CONCURRENCY,
+                    section_timeout=env.SECTION_TIMEOUT,
+                    dry_run=dry_run,
+                    **options,
+                )
+            metrics.FEED_UPSTREAM_REQUESTS.observe(trace.upstream)
+        LOG.info(f"Built {cache_key} with {trace.upstream} requests to Instagram")
+        if rss.missing_sections:
+            LOG.warning(f"Built {cache_key} without its {', '.join(rss.missing_sections)}. Rebuilding it sooner")
+        # keeps Last-Modified if unchanged
+        feed = CachedFeed.from_content(rss_content, previous=cached_response, partial=bool(rss.missing_sections))
+        if not dry_run:
+            await set_cached_item(cache_key, feed)
+            refresher.schedule(cache_key, feed.built_at, ttl=feed.ttl)
+        return feed
+
+
+async def refresh_feed(cache_key: str, hot_feed: HotFeed) -> CachedFeed:
+    return await singleflight.do(cache_key, partial(build_feed, cache_key, hot_feed.user_id, hot_feed.options))
+
+
+refresher = FeedRefresher(
+    build=refresh_feed,
+    get=partial(get_cached_item, skip_l1=True),  # to see the refreshes of the other replicas
+    ttl=env.CACHE_DURATION,
+    hot_window=env.CACHE_DURATION + env.STALE_DURATION,
+    budget_per_minute=env.REFRESH_BUDGET,
+)
+
+
+async def prefetch_stories(user_ids: list[int]):
+    with metrics.trace(new=True) as trace:
+        async with instaloader_session() as il:
+            await scraper.run(metrics.timed("stories_prefetch", fetch_stories), il, user_ids, item_cache)
+    LOG.info(f"Prefetched the stories of {len(user_ids)} users with {trace.upstream} requests to Instagram")
+
+
+story_prefetcher = StoryPrefetcher(
+    fetch=prefetch_stories,
+    interval=env.STORIES_PREFETCH_INTERVAL,
+    hot_window=env.CACHE_DURATION + env.STALE_DURATION,
+    batch_size=env.STORIES_BATCH_SIZE,
+)
+
 
-            logged_in = instaloader_instance.test_login()
-            if logged_in:
-                LOG.green("Logged in successfully. Saving session")
-                instaloader_instance.save_session_to_file(env.IG_SESSION_FILEPATH)
-            else:
-                LOG.warning("Login from scratch failed")
+def feed_response(request: Request, feed: CachedFeed) -> Response:
+    """
+    Respond with the feed and its ETag and Last-Modified, or with 304 if the reader has it already.
+    The stored gzip body is sent as is if the reader accepts gzip, so only the others cost a decompression.
+    """
+    encodings = tools.accepted_encodings(request.headers.get("accept-encoding", ""))
+    if "gzip" in encodings:
+        encoding, content = "gzip", feed.gzip
+    else:
+        encoding, content = None, None
+
+    headers = {"Vary": "Accept-Encoding"}
+    if encoding:
+        headers["Content-Encoding"] = encoding
+    headers["ETag"] = f'W/"{feed.etag}"' if encoding else f'"{feed.etag}"'
+    if feed.last_modified is not None:
+        headers["Last-Modified"] = formatdate(feed.last_modified, usegmt=True)
+    if tools.is_not_modified(request.headers, feed):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+    return Response(
+        content=content or feed.content,
+        media_type="application/xml",
+        status_code=status.HTTP_200_OK,
+        headers=headers,
+    )
+
+
+async def user_id_of(username: str) -> str:
+    """Resolve a username to its user_id, looking it up in the state store first."""
+    known_user_id = await asyncio.to_thread(state.get_user_id, username)  # SQLite, off the event loop
+    if known_user_id == PROFILE_NOT_EXISTS:
+        msg = f"Profile {username} does not exist."
+        raise ProfileNotExistsException(msg)
+    if known_user_id:
+        return known_user_id
+
+    try:
+        async with instaloader_session() as il:
+            profile = await scraper.run(metrics.timed("profile", Profile.from_username), il.context, username)
+    except ProfileNotExistsException:
+        await asyncio.to_thread(state.set_user_id, username, None)
+        raise
+
+    await asyncio.to_thread(state.set_user_id, username, profile.userid)
+    return str(profile.userid)
+
+
+def no_session_response(e: NoSessionAvailableError) -> Response:
+    """Answer 503 while no session is logged in, instead of a feed whose error entry would stay in the readers."""
+    return Response(
+        content=str(e),
+        media_type="text/plain",
+        status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+        headers={"Retry-After": str(sessions.retry_after())},
+    )
 
-        last_login_check_time = current_time  # Update the last login check time
 
-    return instaloader_instance
+async def resolve_username(username: str, redirect_url: str) -> Response:
+    """Redirect to the user_id feed of a username."""
+    try:
+        user_id = await user_id_of(username)
+    except NoSessionAvailableError as e:
+        return no_session_response(e)
+    except Exception as e:  # noqa: BLE001
+        rss_content = tools.generate_erroreus_rss_feed(f"{type(e)}: {e!s}")
+        return Response(content=rss_content, media_type="application/xml", status_code=status.HTTP_200_OK)
+    return RedirectResponse(url=f"/instagram/{user_id}{redirect_url}", status_code=status.HTTP_302_FOUND)
+
+
+def feed_cache_key(user_id: str | None, username: str | None, options: dict) -> str:
+    return "-".join(str(_) for _ in (user_id, username, *options.values()))
+
+
+async def get_feed(
+    cache_key: str,
+    user_id: str,
+    options: dict,
+    *,
+    dry_run: bool = False,
+    wait: bool = True,
+) -> CachedFeed | None:
+    """
+    Return the cached feed, stale while it is being refreshed, or build it.
+    Without ``wait`` a feed that is not cached is built in the background instead, and None is returned.
+    """
+    cached_response = await get_cached_item(cache_key)
+    if not dry_run:
+        refresher.touch(
+            cache_key,
+            user_id,
+            options,
+            cached_response.built_at if cached_response else None,
+            ttl=cached_response.ttl if cached_response else None,
+        )
+        if options.get("stories"):
+            story_prefetcher.touch(user_id)
+    if cached_response:
+        if not cached_response.is_fresh:
+            LOG.debug(f"Serving stale {cache_key} while it is being refreshed")
+            refresher.revalidate(cache_key)
+        metrics.FEED_CACHE_REQUESTS.inc("hit" if cached_response.is_fresh else "stale")
+        return cached_response
+
+    metrics.FEED_CACHE_REQUESTS.inc("miss")
+    if dry_run:
+        return await build_feed(cache_key, user_id, options, dry_run=True)
+    build = partial(singleflight.do, cache_key, partial(build_feed, cache_key, user_id, options))
+    if not wait:
+        build_in_background(cache_key, build)
+        return None
+    return await build()
+
+
+background_builds: dict[str, asyncio.Task] = {}
+background_build_slots = asyncio.Semaphore(env.BATCH_CONCURRENCY)
+
+
+def build_in_background(key: str, build: Callable[[], Awaitable]):
+    """Run ``build`` once per key at a time, ``BATCH_CONCURRENCY`` builds at once, e.g. for a batch feed."""
+    if key in background_builds:
+        return
+
+    async def run():
+        async with background_build_slots:
+            try:
+                await build()
+            except Exception as e:  # noqa: BLE001
+                LOG.warning(f"Error building {key} in the background: {type(e)}: {e!s}")
+
+    task = background_builds[key] = asyncio.create_task(run())
+    task.add_done_callback(lambda _: background_builds.pop(key, None))
 
 
 @app.get("/instagram/{query}")
 async def instagram_query(  # noqa: PLR0913
+    request: Request,
     query: str | int | None,
     user_id: Annotated[str | None, Query()] = None,
     username: Annotated[str | None, Query()] = None,
@@ -142,27 +400,17 @@ async def instagram_query(  # noqa: PLR0913
             status_code=status.HTTP_400_BAD_REQUEST,
         )
 
-    cache_key = f"{user_id}-{username}-{posts}-{posts_limit}-{reels}-{reels_limit}-{stories}-{tagged}-{tagged_limit}"
-    cached_response = await get_cached_item(cache_key)
-    if cached_response:
-        return Response(content=cached_response, media_type="application/xml", status_code=status.HTTP_200_OK)
-
-    il = get_instaloader()  # Use the cached Instaloader instance
-
-    if user_id:
-        profile = Profile.from_id(il.context, user_id)
-    else:
-        try:
-            profile = Profile.from_username(il.context, username)
-        except ProfileNotExistsException as e:
-            rss_content = tools.generate_erroreus_rss_feed(f"{type(e)}: {e!s}")
-            return Response(content=rss_content, media_type="application/xml", status_code=status.HTTP_200_OK)
-        except Exception as e:  # noqa: BLE001
-            rss_content = tools.generate_erroreus_rss_feed(f"{type(e)}: {e!s}")
-            return Response(content=rss_content, media_type="application/xml", status_code=status.HTTP_200_OK)
-
-        url = (
-            f"/instagram/{profile.userid}"
+    options = dict(
+        posts=posts,
+        posts_limit=posts_limit,
+        reels=reels,
+        reels_limit=reels_limit,
+        stories=stories,
+        tagged=tagged,
+        tagged_limit=tagged_limit,
+    )
+    if not user_id:
+        redirect_url = (
             f"?posts=0"
             f"&reels=0"
             f"&tagged=0"
@@ -172,10 +420,118 @@ async def instagram_query(  # noqa: PLR0913
             f"&tagged_limit={tagged_limit}"
             f"&dry_run={dry_run}"
         )
-        return RedirectResponse(url=url, status_code=status.HTTP_302_FOUND)
+        return await resolve_username(username, redirect_url)
 
-    rss = InstagramUserRSS(profile=profile, il=il)
-    rss_content = rss.get_rss(
+    try:
+        feed = await get_feed(feed_cache_key(user_id, username, options), user_id, options, dry_run=dry_run)
+    except NoSessionAvailableError as e:
+        return no_session_response(e)
+    return feed_response(request, feed)
+
+
+def batch_users(users: list[str] | None, group: str | None) -> list[str] | None:
+    """Collect the users of a batch, given comma-separated or repeated, and by the name of a group."""
+    result = [_.strip() for value in users or [] for _ in value.split(",") if _.strip()]
+    if group:
+        groups = tools.load_groups(env.BATCH_GROUPS_FILEPATH)
+        if group not in groups:
+            return None
+        result += groups[group]
+    return list(dict.fromkeys(result))
+
+
+def batch_opml(request: Request, users: list[str], title: str) -> Response:
+    """List the feeds of the users, with the parameters of the batch request."""
+    params = {k: v for k, v in request.query_params.items() if k not in {"users", "group", "format"}}
+    outlines = [
+        serializer.Outline(
+            text=user,
+            xml_url=str(request.url_for("instagram_query", query=user).include_query_params(**params)),
+            html_url=None if user.isnumeric() else f"{BASE_URL}{user}",
+        )
+        for user in users
+    ]
+    return Response(content=serializer.opml(title, outlines), media_type="text/x-opml")
+
+
+async def batch_feed(request: Request, users: list[str], title: str, options: dict) -> Response:
+    """
+    Merge the cached feeds of the users, fresh or stale, looked up ``BATCH_CONCURRENCY`` at a time.
+    The others are built in the background and left out until they are cached, so that a batch of hundreds
+    of users never waits for Instagram. The merged feed is cached by the ETags of its parts, so it is merged
+    again only when one of them changes.
+    """
+    semaphore = asyncio.Semaphore(env.BATCH_CONCURRENCY)
+
+    async def build_user_feed(user: str):
+        user_id = await user_id_of(user)
+        await get_feed(feed_cache_key(user_id, None, options), user_id, options)
+
+    async def fetch(user: str) -> CachedFeed | None:
+        async with semaphore:
+            user_id = user if user.isnumeric() else await asyncio.to_thread(state.get_user_id, user)
+            if user_id is None:
+                build_in_background(f"username-{user.lower()}", partial(build_user_feed, user))
+                return None
+            if user_id == PROFILE_NOT_EXISTS:
+                LOG.debug(f"Leaving {user} out of the batch feed: the profile does not exist")
+                return None
+            return await get_feed(feed_cache_key(user_id, None, options), user_id, options, wait=False)
+
+    parts = [_ for _ in await asyncio.gather(*(fetch(_) for _ in users)) if _ is not None]
+    if len(parts) < len(users):
+        LOG.info(f"Leaving {len(users) - len(parts)} of {len(users)} users out of the batch feed until they are built")
+    digest = hashlib.blake2b(str(request.url).encode(), digest_size=16)
+    for part in parts:
+        digest.update(part.etag.encode())
+    cache_key = f"batch-{digest.hexdigest()}"
+    feed = await get_cached_item(cache_key)
+    if feed is None:
+        merged = serializer.Feed(id=str(request.url), title=title, description=f"Instagram: {', '.join(users)}")
+
+        def merge() -> CachedFeed:
+            return CachedFeed.from_content(serializer.merge_atom(merged, [_.content for _ in parts]))
+
+        feed = await asyncio.to_thread(merge)
+        if parts:  # an empty one would be served until the feeds of its users change
+            await set_cached_item(cache_key, feed)
+    return feed_response(request, feed)
+
+
+@app.get("/batch")
+async def batch_query(  # noqa: PLR0913
+    request: Request,
+    users: Annotated[list[str] | None, Query()] = None,
+    group: Annotated[str | None, Query()] = None,
+    output: Annotated[Literal["atom", "opml"], Query(alias="format")] = "atom",
+    posts: Annotated[bool | None, Query()] = env.POSTS,
+    posts_limit: Annotated[int | None, Query()] = env.POSTS_LIMIT,
+    reels: Annotated[bool | None, Query()] = env.REELS,
+    reels_limit: Annotated[int | None, Query()] = env.REELS_LIMIT,
+    stories: Annotated[bool | None, Query()] = env.STORIES,
+    tagged: Annotated[bool | None, Query()] = env.TAGGED,
+    tagged_limit: Annotated[int | None, Query()] = env.TAGGED_LIMIT,
+):
+    """One feed of the posts of several users, or with ``format=opml`` the list of their feeds."""
+    user_list = batch_users(users, group)
+    if user_list is None:
+        return Response(
+            content=f"Unknown group {group}",
+            media_type="text/plain",
+            status_code=status.HTTP_404_NOT_FOUND,
+        )
+    if not user_list:
+        return Response(
+            content="Please provide users or a group",
+            media_type="text/plain",
+            status_code=status.HTTP_400_BAD_REQUEST,
+        )
+
+    title = group or f"{len(user_list)} Instagram users"
+    if output == "opml":
+        return batch_opml(request, user_list, title)
+
+    options = dict(
         posts=posts,
         posts_limit=posts_limit,
         reels=reels,
@@ -183,11 +539,32 @@ async def instagram_query(  # noqa: PLR0913
         stories=stories,
         tagged=tagged,
         tagged_limit=tagged_limit,
-        dry_run=dry_run,
     )
-    if not dry_run:
-        await set_cached_item(cache_key, rss_content.decode() if isinstance(rss_content, bytes) else rss_content)
-    return Response(content=rss_content, media_type="application/xml", status_code=status.HTTP_200_OK)
+    return await batch_feed(request, user_list, title, options)
+
+
+@app.get("/media/{signature}/{name}")
+async def get_media(signature: str, name: str) -> Response:
+    """Serve a medium the feeds link through the media proxy, with range requests."""
+    url = media_proxy.verify(signature, name) if media_proxy else None
+    if url is None:
+        return Response(content="Unknown media", media_type="text/plain", status_code=status.HTTP_404_NOT_FOUND)
+
+    for _ in range(MEDIA_ATTEMPTS):
+        try:
+            path = await media_proxy.get(url)
+        except Exception as e:  # noqa: BLE001
+            LOG.warning(f"{type(e)} while fetching {url}: {e}")
+            break
+        if path.exists():  # not evicted by the fetch of another medium meanwhile
+            # a medium never changes under its URL
+            return FileResponse(path, headers={"Cache-Control": "public, max-age=31536000, immutable"})
+    return Response(content="Media not available", media_type="text/plain", status_code=status.HTTP_502_BAD_GATEWAY)
+
+
+@app.get("/metrics", tags=["healthcheck"], summary="Prometheus metrics")
+async def get_metrics() -> Response:
+    return Response(content=metrics.render(), media_type="text/plain; version=0.0.4")
 
 
 @app.get(
@@ -200,7 +577,16 @@ async def instagram_query(  # noqa: PLR0913
 )
 async def get_health() -> HealthCheck:
     LOG.debug("Health check endpoint accessed")
-    return HealthCheck(status="OK")
+    return HealthCheck(
+        status="OK",
+        scraper=scraper.stats(),
+        rate_limiter=rate_limiter.stats(),
+        sessions=sessions.stats(),
+        memory_cache=memory_cache.stats(),
+        item_memory_cache=item_memory_cache.stats(),
+        redis=redis_breaker.stats() if env.REDIS_URL else None,
+        media_cache=media_proxy.stats() if media_proxy else None,
+    )
 
 
 if __name__ == "__main__":
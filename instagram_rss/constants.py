@@ -1,6 +1,10 @@
 from __future__ import annotations
 
 IG_SESSION_FILEPATH_DEFAULT = "/data/session.json"
+STATE_DB_FILEPATH_DEFAULT = "/data/state.sqlite3"
+BATCH_GROUPS_FILEPATH_DEFAULT = "/data/groups.json"
+MEDIA_CACHE_DIRPATH_DEFAULT = "/data/media"
+MEDIA_PROXY_SECRET_FILEPATH_DEFAULT = "/data/media_secret"  # noqa: S105
 POSTS_DEFAULT = True
 POSTS_LIMIT_DEFAULT = 5
 REELS_DEFAULT = True
@@ -9,3 +13,33 @@ STORIES_DEFAULT = True
 TAGGED_DEFAULT = False
 TAGGED_LIMIT_DEFAULT = 2
 TZ_DEFAULT = "Europe/London"
+FEED_SERIALIZERS = ("fast", "feedgen")
+FEED_SERIALIZER_DEFAULT = "fast"
+EXTRACTIONS = ("lean", "full")
+EXTRACTION_DEFAULT = "lean"
+SESSION_QUARANTINE_DEFAULT = 1800
+SESSION_WAIT_DEFAULT = 30
+IG_RATE_LIMIT_DEFAULT = 60
+IG_RATE_BURST_DEFAULT = 10
+SCRAPE_WORKERS_DEFAULT = 4
+SECTION_CONCURRENCY_DEFAULT = 4
+SECTION_TIMEOUT_DEFAULT = 60
+BATCH_CONCURRENCY_DEFAULT = 8
+REDIS_LOCK_TIMEOUT_DEFAULT = 120
+REDIS_TIMEOUT_DEFAULT = 1
+REDIS_FAILURES_DEFAULT = 3
+REDIS_COOLDOWN_DEFAULT = 30
+CACHE_L1_DURATION_DEFAULT = 60
+STALE_DURATION_DEFAULT = 3600
+PARTIAL_CACHE_DURATION_DEFAULT = 300
+REFRESH_BUDGET_DEFAULT = 10
+STORIES_PREFETCH_INTERVAL_DEFAULT = 1800
+STORIES_BATCH_SIZE_DEFAULT = 50
+SLOW_REQUEST_SECONDS_DEFAULT = 10
+ITEM_CACHE_DURATION_DEFAULT = 86400
+MAX_CACHE_SIZE_DEFAULT = 1000
+MAX_CACHE_BYTES_DEFAULT = 128 * 1024 * 1024
+ITEM_CACHE_SIZE_DEFAULT = 20000
+MEDIA_CACHE_BYTES_DEFAULT = 1024 * 1024 * 1024
+USERNAME_CACHE_DURATION_DEFAULT = 30 * 86400
+USERNAME_NOT_FOUND_DURATION_DEFAULT = 3600
@@ -1,4 +1,5 @@
 from __future__ import annotations
+import json
 import os
 from global_logger import Log
 from dotenv import load_dotenv
@@ -21,9 +22,30 @@ IG_OTP = os.getenv("IG_OTP")
 
 IG_SESSION_FILEPATH = os.getenv("IG_SESSION_FILEPATH", str(constants.IG_SESSION_FILEPATH_DEFAULT))
 assert IG_SESSION_FILEPATH, "IG_SESSION_FILEPATH environment variable not set"
+# more accounts to spread the scraping over: [{"username": "", "password": "", "otp": ""}, ...]
+IG_ACCOUNTS = json.loads(os.getenv("IG_ACCOUNTS") or "[]")
+SESSION_QUARANTINE = int(os.getenv("SESSION_QUARANTINE", constants.SESSION_QUARANTINE_DEFAULT))  # Bad session pause
+SESSION_WAIT = int(os.getenv("SESSION_WAIT", constants.SESSION_WAIT_DEFAULT))  # Wait for the first logins after a start
+STATE_DB_FILEPATH = os.getenv("STATE_DB_FILEPATH", constants.STATE_DB_FILEPATH_DEFAULT)
+# named groups of users for /batch: {"group": ["user_id", "username", ...]}
+BATCH_GROUPS_FILEPATH = os.getenv("BATCH_GROUPS_FILEPATH", constants.BATCH_GROUPS_FILEPATH_DEFAULT)
+
+IG_RATE_LIMIT = int(os.getenv("IG_RATE_LIMIT", constants.IG_RATE_LIMIT_DEFAULT))  # Instagram requests per minute
+IG_RATE_BURST = int(os.getenv("IG_RATE_BURST", constants.IG_RATE_BURST_DEFAULT))  # Instagram requests at once
 
 REDIS_URL = os.getenv("REDIS_URL", "")
+REDIS_LOCK_TIMEOUT = int(os.getenv("REDIS_LOCK_TIMEOUT", constants.REDIS_LOCK_TIMEOUT_DEFAULT))  # Build lock seconds
+REDIS_TIMEOUT = float(os.getenv("REDIS_TIMEOUT", constants.REDIS_TIMEOUT_DEFAULT))  # Seconds per cache operation
+REDIS_FAILURES = int(os.getenv("REDIS_FAILURES", constants.REDIS_FAILURES_DEFAULT))  # In a row, to stop using redis
+REDIS_COOLDOWN = int(os.getenv("REDIS_COOLDOWN", constants.REDIS_COOLDOWN_DEFAULT))  # Seconds before trying it again
 PORT = os.getenv("PORT", "8000")
+# public URL of this service, e.g. https://rss.example.com. Enables the media proxy
+MEDIA_PROXY_URL = os.getenv("MEDIA_PROXY_URL", "")
+MEDIA_PROXY_SECRET = os.getenv("MEDIA_PROXY_SECRET", "")  # Signs the proxied URLs
+# the secret generated when MEDIA_PROXY_SECRET is empty, kept to sign the same URLs after a restart
+MEDIA_PROXY_SECRET_FILEPATH = os.getenv("MEDIA_PROXY_SECRET_FILEPATH", constants.MEDIA_PROXY_SECRET_FILEPATH_DEFAULT)
+MEDIA_CACHE_DIRPATH = os.getenv("MEDIA_CACHE_DIRPATH", constants.MEDIA_CACHE_DIRPATH_DEFAULT)
+MEDIA_CACHE_BYTES = int(os.getenv("MEDIA_CACHE_BYTES", constants.MEDIA_CACHE_BYTES_DEFAULT))  # Proxied media on disk
 
 POSTS = strtobool(os.getenv("POSTS", str(constants.POSTS_DEFAULT)))  # posts boolean default value
 POSTS_LIMIT = int(os.getenv("POSTS_LIMIT", constants.POSTS_LIMIT_DEFAULT))  # Max number of posts to fetch
@@ -33,5 +55,32 @@ STORIES = strtobool(os.getenv("STORIES", str(constants.STORIES_DEFAULT)))  # sto
 TAGGED = strtobool(os.getenv("TAGGED", str(constants.TAGGED_DEFAULT)))  # tagged boolean default value
 TAGGED_LIMIT = int(os.getenv("TAGGED_LIMIT", constants.TAGGED_LIMIT_DEFAULT))  # Max number of tagged posts to fetch
 TZ = os.getenv("TZ", constants.TZ_DEFAULT)
+FEED_SERIALIZER = os.getenv("FEED_SERIALIZER", constants.FEED_SERIALIZER_DEFAULT)
+assert FEED_SERIALIZER in constants.FEED_SERIALIZERS, f"FEED_SERIALIZER must be one of {constants.FEED_SERIALIZERS}"
+EXTRACTION = os.getenv("EXTRACTION", constants.EXTRACTION_DEFAULT)
+assert EXTRACTION in constants.EXTRACTIONS, f"EXTRACTION must be one of {constants.EXTRACTIONS}"
 
 CACHE_DURATION = int(os.getenv("CACHE_DURATION", "3600"))  # Cache duration in seconds
+CACHE_L1_DURATION = int(os.getenv("CACHE_L1_DURATION", constants.CACHE_L1_DURATION_DEFAULT))  # Feeds from redis
+MAX_CACHE_SIZE = int(os.getenv("MAX_CACHE_SIZE", constants.MAX_CACHE_SIZE_DEFAULT))  # Feeds kept in memory
+MAX_CACHE_BYTES = int(os.getenv("MAX_CACHE_BYTES", constants.MAX_CACHE_BYTES_DEFAULT))  # Per in-process cache
+ITEM_CACHE_SIZE = int(os.getenv("ITEM_CACHE_SIZE", constants.ITEM_CACHE_SIZE_DEFAULT))  # Posts kept in memory
+STALE_DURATION = int(os.getenv("STALE_DURATION", constants.STALE_DURATION_DEFAULT))  # Serve expired feeds meanwhile
+PARTIAL_CACHE_DURATION = int(  # Cache duration of the feeds missing a section, which are rebuilt sooner
+    os.getenv("PARTIAL_CACHE_DURATION", constants.PARTIAL_CACHE_DURATION_DEFAULT),
+)
+REFRESH_BUDGET = int(os.getenv("REFRESH_BUDGET", constants.REFRESH_BUDGET_DEFAULT))  # Background refreshes per minute
+STORIES_PREFETCH_INTERVAL = int(  # Seconds between the batched story fetches, 0 disables
+    os.getenv("STORIES_PREFETCH_INTERVAL", constants.STORIES_PREFETCH_INTERVAL_DEFAULT),
+)
+STORIES_BATCH_SIZE = int(os.getenv("STORIES_BATCH_SIZE", constants.STORIES_BATCH_SIZE_DEFAULT))  # Users per fetch
+ITEM_CACHE_DURATION = int(os.getenv("ITEM_CACHE_DURATION", constants.ITEM_CACHE_DURATION_DEFAULT))  # Per post cache
+USERNAME_CACHE_DURATION = int(os.getenv("USERNAME_CACHE_DURATION", constants.USERNAME_CACHE_DURATION_DEFAULT))
+USERNAME_NOT_FOUND_DURATION = int(
+    os.getenv("USERNAME_NOT_FOUND_DURATION", constants.USERNAME_NOT_FOUND_DURATION_DEFAULT),
+)
+SLOW_REQUEST_SECONDS = float(os.getenv("SLOW_REQUEST_SECONDS", constants.SLOW_REQUEST_SECONDS_DEFAULT))  # Logged
+SCRAPE_WORKERS = int(os.getenv("SCRAPE_WORKERS", constants.SCRAPE_WORKERS_DEFAULT))  # Concurrent Instaloader scrapes
+SECTION_CONCURRENCY = int(os.getenv("SECTION_CONCURRENCY", constants.SECTION_CONCURRENCY_DEFAULT))  # Per feed
+SECTION_TIMEOUT = int(os.getenv("SECTION_TIMEOUT", constants.SECTION_TIMEOUT_DEFAULT))  # Seconds per feed section
+BATCH_CONCURRENCY = int(os.getenv("BATCH_CONCURRENCY", constants.BATCH_CONCURRENCY_DEFAULT))  # Users per /batch
@@ -1,2 +1,6 @@
 class UserNotFoundError(Exception):
     pass
+
+
+class NoSessionAvailableError(Exception):
+    pass
@@ -1,18 +1,30 @@
 from __future__ import annotations
+import asyncio
 from zoneinfo import ZoneInfo
 from datetime import datetime
-from itertools import islice
 from typing import TYPE_CHECKING
-from feedgen.entry import FeedEntry
-from feedgen.feed import FeedGenerator
-from instagram_rss import env, constants
+from instagram_rss import env, constants, metrics, serializer
+from instagram_rss.models import MediaData, PostData, StoryItemData, UserStories
+from instagram_rss.serializer import Entry, Feed
+from instagram_rss.state import INDEX_LENGTH_MAX, SectionIndex
 from global_logger import Log
+from instaloader import StoryItem
 
 if TYPE_CHECKING:
-    from instaloader import Profile, NodeIterator, Post, Story, PostSidecarNode, Instaloader, StoryItem
+    from collections.abc import Awaitable, Callable
+    from collections.abc import Iterator
+    from instaloader import Profile, NodeIterator, Post, PostSidecarNode, Instaloader, Story
+    from instagram_rss.item_cache import ItemCache
+    from instagram_rss.media import MediaProxy
+    from instagram_rss.state import StateStore
 
 LOG = Log.get_logger()
 BASE_URL = "https://www.instagram.com/"
+SECTIONS = {"posts": "posts", "reels": "reels", "stories": "stories", "tagged": "tagged posts"}
+PINNED_POSTS_MAX = 3  # pinned to the top of a profile section, out of date order
+STORIES_PREFETCH_AGE_MAX = 2  # prefetch intervals, so that one failed prefetch does not cost a request per feed
+# the date of the feeds without posts, so that rebuilding them does not change their content and their ETag
+NO_POSTS_DATE = datetime.fromtimestamp(0, tz=ZoneInfo(env.TZ))
 
 
 def rss_image(url, i, post_link):
@@ -37,86 +49,269 @@ def link(url, text):
     return f'<a href="{url}">{text}</a>'
 
 
+def lean_media(post: Post) -> list[MediaData] | None:
+    """
+    Read the media of a post from its node of the paginated query, instead of the iPhone API lookup per post that
+    the Post properties make. Only the sidecars with videos need the full metadata, for the video URLs.
+    None if the node lacks the media.
+    """
+    node = post._node  # noqa: SLF001
+    typename = post.typename
+    if typename == "GraphSidecar":
+        with metrics.stage("sidecar"):
+            edges = post._field("edge_sidecar_to_children", "edges")  # noqa: SLF001
+            if any(_["node"]["is_video"] and "video_url" not in _["node"] for _ in edges):
+                edges = post._full_metadata["edge_sidecar_to_children"]["edges"]  # noqa: SLF001
+        nodes = [_["node"] for _ in edges]
+        return [
+            MediaData(url=_["video_url"] if _["is_video"] else _["display_url"], is_video=_["is_video"]) for _ in nodes
+        ]
+    if typename == "GraphImage":
+        url = node.get("display_url") or node.get("display_src")
+        return [MediaData(url=url, is_video=False)] if url else None
+    if typename == "GraphVideo":
+        url = node.get("video_url")
+        return [MediaData(url=url, is_video=True)] if url else None
+    return None
+
+
+def full_media(post: Post) -> list[MediaData]:
+    """Read the media of a post through the Post properties, in the quality of the iPhone API."""
+    media = []
+    if post.typename == "GraphSidecar":
+        if post.mediacount > 0:
+            with metrics.stage("sidecar"):
+                for sidecar_node in post.get_sidecar_nodes():
+                    sidecar_node: PostSidecarNode
+                    url = sidecar_node.video_url if sidecar_node.is_video else sidecar_node.display_url
+                    media.append(MediaData(url=url, is_video=sidecar_node.is_video))
+    elif post.typename == "GraphImage":
+        media.append(MediaData(url=post.url, is_video=False))
+    elif post.typename == "GraphVideo":
+        media.append(MediaData(url=post.video_url, is_video=True))
+    return media
+
+
+def lean_tagged_users(post: Post) -> list[str] | None:
+    """
+    Read the tagged users of a post from its node, graphql or iPhone API shaped, instead of the full metadata
+    lookup per post that Post.tagged_users makes for the latter. None if the node lacks them.
+    """
+    node = post._node  # noqa: SLF001
+    if "edge_media_to_tagged_user" in node:
+        return [_["node"]["user"]["username"].lower() for _ in node["edge_media_to_tagged_user"]["edges"]]
+    iphone_struct = node.get("iphone_struct")
+    if iphone_struct is None:
+        return None
+    return [_["user"]["username"].lower() for _ in (iphone_struct.get("usertags") or {}).get("in", [])]
+
+
+def extract_post(post: Post, *, lean: bool = False) -> PostData:
+    media = lean_media(post) if lean else None
+    tagged_users = lean_tagged_users(post) if lean else None
+    metrics.EXTRACTIONS.inc("post", "full" if media is None or tagged_users is None else "lean")
+    if media is None:
+        media = full_media(post)
+    if tagged_users is None:
+        tagged_users = post.tagged_users
+
+    return PostData(
+        shortcode=post.shortcode,
+        owner_username=post.owner_username,
+        caption=post.caption,
+        date=post.date_local,
+        typename=post.typename,
+        media=media,
+        tagged_users=tagged_users,
+    )
+
+
+def lean_story_url(story_item: StoryItem) -> str | None:
+    """Read the media URL of a story item from its node, instead of the iPhone API lookup per item."""
+    resources = story_item._node.get("video_resources" if story_item.is_video else "display_resources")  # noqa: SLF001
+    return resources[-1]["src"] if resources else None
+
+
+def extract_story_item(story_item: StoryItem, owner_username: str, *, lean: bool = False) -> StoryItemData:
+    url = lean_story_url(story_item) if lean else None
+    metrics.EXTRACTIONS.inc("story", "full" if url is None else "lean")
+    if url is None:
+        url = story_item.video_url if story_item.is_video else story_item.url
+    return StoryItemData(
+        mediaid=story_item.mediaid,
+        owner_username=owner_username,
+        date=story_item.date_local,
+        is_video=story_item.is_video,
+        url=url,
+    )
+
+
+def story_items(story: Story, *, lean: bool = False) -> Iterator[StoryItem]:
+    """
+    Iterate the items of a story, lean without the iPhone API lookup of the stories of the user that
+    Story.get_items makes for the URLs in the quality of the iPhone API.
+    """
+    if not lean:
+        yield from story.get_items()
+        return
+    for node in reversed(story._node["items"]):  # noqa: SLF001
+        yield StoryItem(story._context, node, story.owner_profile)  # noqa: SLF001
+
+
+def fetch_stories(il: Instaloader, userids: list[int], item_cache: ItemCache | None = None) -> dict[int, UserStories]:
+    """
+    Fetch the story items of the users, in one request to Instagram per 50 users,
+    and store them per user in ``item_cache``. The users without stories get no items.
+    """
+    lean = env.EXTRACTION == "lean"
+    result = {int(_): UserStories(items=[]) for _ in userids}
+    for story in il.get_stories(list(result)):
+        user_stories = result.setdefault(story.owner_id, UserStories(items=[]))
+        for story_item in story_items(story, lean=lean):
+            story_item_data = item_cache.get_story_item(story_item.mediaid) if item_cache else None
+            if story_item_data is None:
+                story_item_data = extract_story_item(story_item, story.owner_username, lean=lean)
+                if item_cache:
+                    item_cache.set_story_item(story_item_data)
+            user_stories.items.append(story_item_data)
+    if item_cache:
+        for userid, user_stories in result.items():
+            item_cache.set_user_stories(userid, user_stories)
+    return result
+
+
 class InstagramUserRSS:
-    def __init__(self, profile: Profile, il: Instaloader):
+    def __init__(
+        self,
+        profile: Profile,
+        il: Instaloader,
+        item_cache: ItemCache | None = None,
+        state: StateStore | None = None,
+        media_proxy: MediaProxy | None = None,
+    ):
         assert profile, "profile must be provided"
         self.profile: Profile = profile
         self.il: Instaloader = il
+        self.item_cache = item_cache
+        self.state = state
+        self.missing_sections: list[str] = []
+        self.media_proxy = media_proxy
         self.base_url = BASE_URL
 
     @property
     def url(self):
         return f"{self.base_url}{self.profile.username}"
 
-    def generate_rss_feed(  # noqa: PLR0915, PLR0913, PLR0912, C901
+    def media_url(self, url: str | None) -> str | None:
+        return self.media_proxy.url(url) if self.media_proxy else url
+
+    def _extract_post(self, post: Post) -> PostData:
+        post_data = self.item_cache.get_post(post.shortcode) if self.item_cache else None
+        if post_data is None:
+            post_data = extract_post(post, lean=env.EXTRACTION == "lean")
+            if self.item_cache:
+                self.item_cache.set_post(post_data)
+        return post_data
+
+    def get_section(self, section: str, posts: NodeIterator[Post], limit: int) -> list[PostData]:
+        """
+        Take the first ``limit`` posts of a profile section, reusing the posts cached by earlier builds.
+
+        The shortcodes and the newest post date of the previous build are kept in the state store. Once the iterator
+        reaches known content, the rest is taken from the cache and the iterator is not paginated any further,
+        so rebuilding an unchanged section costs one page. A known post at the top that is older than the newest
+        known one is likely pinned, with new posts below it, and is taken from the cache without stopping there.
+        """
+        index = self.state.get_section(self.profile.userid, section) if self.state else SectionIndex(shortcodes=[])
+        known = index.shortcodes if self.item_cache else []
+        result: list[PostData] = []
+        for i, post in enumerate(posts):
+            shortcode = post.shortcode
+            taken = {_.shortcode for _ in result}
+            if shortcode in taken:
+                continue  # taken from the cache already
+
+            cached_run = []
+            pinned = i < PINNED_POSTS_MAX and index.newest and post.date_local.timestamp() < index.newest
+            if shortcode in known and not pinned:
+                start = known.index(shortcode)
+                for post_data in self.item_cache.get_posts(known[start : start + limit - len(result)]):
+                    if post_data is None or post_data.shortcode in taken:
+                        break
+                    cached_run.append(post_data)
+
+            if cached_run:
+                LOG.debug(f"Reusing {len(cached_run)} cached {section} of {self.profile.username} from {shortcode}")
+                result.extend(cached_run)
+            else:
+                result.append(self._extract_post(post))
+            if len(result) >= limit:
+                break
+
+        result = result[:limit]
+        if self.state:
+            shortcodes = [_.shortcode for _ in result]
+            shortcodes += [_ for _ in index.shortcodes if _ not in shortcodes]  # keep what the longer limits know
+            newest = max((_.date.timestamp() for _ in result), default=index.newest)
+            updated = SectionIndex(shortcodes=shortcodes[:INDEX_LENGTH_MAX], newest=newest)
+            if updated != index:
+                self.state.set_section(self.profile.userid, section, updated)
+        return result
+
+    def get_stories(self) -> list[StoryItemData]:
+        """
+        Return the stories the story prefetcher fetched along with the ones of other users, if it did recently,
+        or fetch the stories of this user alone.
+        """
+        if self.item_cache and env.STORIES_PREFETCH_INTERVAL:
+            prefetched = self.item_cache.get_user_stories(self.profile.userid)
+            if prefetched is not None and prefetched.age < env.STORIES_PREFETCH_INTERVAL * STORIES_PREFETCH_AGE_MAX:
+                return prefetched.items
+        return fetch_stories(self.il, [self.profile.userid], self.item_cache)[int(self.profile.userid)].items
+
+    def generate_rss_feed(  # noqa: PLR0912, C901
         self,
-        posts: NodeIterator[Post] | None = None,
-        posts_limit: int = constants.POSTS_LIMIT_DEFAULT,
-        reels: NodeIterator[Post] | None = None,
-        reels_limit: int = constants.REELS_LIMIT_DEFAULT,
-        stories: NodeIterator[Story] | None = None,
-        tagged: NodeIterator[Post] | None = None,
-        tagged_limit: int = constants.TAGGED_LIMIT_DEFAULT,
+        posts: list[PostData] | None = None,
+        reels: list[PostData] | None = None,
+        stories: list[StoryItemData] | None = None,
+        tagged: list[PostData] | None = None,
     ):
-        posts_limit = posts_limit or constants.POSTS_LIMIT_DEFAULT
-        reels_limit = reels_limit or constants.REELS_LIMIT_DEFAULT
-        tagged_limit = tagged_limit or constants.TAGGED_LIMIT_DEFAULT
         LOG.info(f"Generating RSS feed for {self.profile.username} ({self.profile.userid})")
-        feed = FeedGenerator()
-        feed.id(self.url)
-        feed.title(self.profile.username)
-        if self.profile.biography:
-            feed.subtitle(self.profile.biography)
-        feed.description(self.profile.biography or "(no biography)")
-        feed.link(href=self.url)
-        if self.profile.profile_pic_url_no_iphone:
-            feed.icon(self.profile.profile_pic_url_no_iphone)
-            feed.logo(self.profile.profile_pic_url_no_iphone)
-
-        entries: list[FeedEntry] = []
-
-        if not posts and not reels and not stories and self.profile.is_private:
+        feed = Feed(
+            id=self.url,
+            title=self.profile.username,
+            description=self.profile.biography or "(no biography)",
+            link=self.url,
+            image=self.media_url(self.profile.profile_pic_url_no_iphone) or None,
+        )
+        entries: list[Entry] = []
+
+        if posts is None and reels is None and stories is None and self.profile.is_private:
             LOG.info(f"No posts or private profile: {self.profile.username} ({self.profile.userid}) @ {self.url}")
-            entry = FeedEntry()
-            entry.id(feed.id())
-            entry.link(feed.link())
-            entry.author(name=self.profile.full_name)
             content = (
                 f"{self.profile.username} private: {self.profile.is_private}"
                 f" followed: {self.profile.followed_by_viewer}"
             )
-            entry.title(content)
-            entry.content(content)
-            post_date = datetime.now(tz=ZoneInfo(env.TZ))
-            entry.published(post_date)
-            entry.updated(post_date)
-            entries.append(entry)
+            entries.append(
+                Entry(
+                    id=feed.id,
+                    link=feed.link,
+                    author=self.profile.full_name,
+                    title=content,
+                    content=content,
+                    content_type=None,
+                    published=NO_POSTS_DATE,
+                ),
+            )
         else:
-            all_posts = []
-            if posts:
-                LOG.info(f"Getting first {posts_limit} posts for {self.profile.username} ({self.profile.userid})")
-                posts_limited = list(islice(posts, posts_limit))
-                all_posts.extend(posts_limited)
-            if reels:
-                LOG.info(f"Getting first {reels_limit} reels for {self.profile.username} ({self.profile.userid})")
-                reels_limited = list(islice(reels, reels_limit))
-                all_posts.extend(reels_limited)
-            if tagged:
-                LOG.info(f"Getting first {tagged_limit} tagged posts for {self.profile.username} {self.profile.userid}")
-                tagged_limited = list(islice(tagged, tagged_limit))
-                all_posts.extend(tagged_limited)
-
+            all_posts = [*(posts or []), *(reels or []), *(tagged or [])]
             LOG.info(f"Parsing results for {self.profile.username} ({self.profile.userid}) @ {self.url}")
             for i, post in enumerate(all_posts):
-                entry = FeedEntry()
                 post_link = f"{self.base_url}p/{post.shortcode}/"
                 LOG.info(
                     f"Parsing result {i + 1}/{len(all_posts)} for {self.profile.username} ({self.profile.userid})"
                     f" @ {post_link}",
                 )
-                entry.id(post_link)
-                entry.link(href=post_link)
-                entry.author(name=post.owner_username)
                 if post.owner_username == self.profile.username:
                     post_type = "post"
                 else:
@@ -126,12 +321,6 @@ class InstagramUserRSS:
                 caption_clean = caption.replace("\n", " ")
                 if len(caption_clean) > 200:  # noqa: PLR2004
                     caption_clean = caption_clean[:100] + "..."
-                entry_caption = f"{self.profile.username} {post_type}: {caption_clean}"
-                entry.title(entry_caption)
-                entry.source(url=post_link, title=caption_clean)
-                post_date = post.date_local
-                entry.published(post_date)
-                entry.updated(post_date)
                 post_content = f"{profile_link(self.profile.username)} {link(post_link, post_type)}<br>{caption}"
 
                 if post.tagged_users:
@@ -139,64 +328,85 @@ class InstagramUserRSS:
                     post_content += "<br>" + "<br>".join(tagged_users_str)
 
                 if post.typename == "GraphSidecar":
-                    if post.mediacount > 0:
-                        sidecar_nodes = post.get_sidecar_nodes()
-                        for j, sidecar_node in enumerate(sidecar_nodes):
-                            sidecar_node: PostSidecarNode
-                            if sidecar_node.is_video:
-                                post_content += rss_video(sidecar_node.video_url)
-                            else:
-                                post_content += rss_image(sidecar_node.display_url, j, post_link)
+                    for j, media in enumerate(post.media):
+                        if media.is_video:
+                            post_content += rss_video(self.media_url(media.url))
+                        else:
+                            post_content += rss_image(self.media_url(media.url), j, post_link)
                 elif post.typename == "GraphImage":
-                    post_content += rss_image(post.url, 1, post_link)
+                    post_content += rss_image(self.media_url(post.media[0].url), 1, post_link)
                 elif post.typename == "GraphVideo":
-                    post_content += rss_video(post.video_url)
+                    post_content += rss_video(self.media_url(post.media[0].url))
                 else:
-                    LOG.error(f"Warning: {post} has unknown typename: {post.typename}")
-
-                entry.content(post_content, type="html")
-                entries.append(entry)
+                    LOG.error(f"Warning: {post.shortcode} has unknown typename: {post.typename}")
+
+                entries.append(
+                    Entry(
+                        id=post_link,
+                        link=post_link,
+                        author=post.owner_username,
+                        title=f"{self.profile.username} {post_type}: {caption_clean}",
+                        content=post_content,
+                        published=post.date,
+                        source_url=post_link,
+                        source_title=caption_clean,
+                    ),
+                )
 
         if stories:
             LOG.info(f"Parsing stories for {self.profile.username} ({self.profile.userid})")
-            for story in stories:
-                story: Story
-                for story_item in story.get_items():
-                    story_item: StoryItem
-
-                    entry = FeedEntry()
-                    story_link = f"{self.base_url}stories/{self.profile.username}/{story_item.mediaid}/"
-                    entry.id(story_link)
-                    entry.link(href=story_link)
-                    entry.author(name=story.owner_username)
-                    title = f"{story.owner_username} story"
-                    entry.title(title)
-                    entry.source(url=story_link, title=title)
-                    post_content = f"{profile_link(story.owner_username)} {link(story_link, 'story')}<br>{title}"
-                    post_date = story_item.date_local
-                    entry.published(post_date)
-                    entry.updated(post_date)
-                    if story_item.is_video:
-                        post_content += rss_video(story_item.video_url)
-                    else:
-                        post_content += rss_image_story(story_item.url, story_link)
-
-                    entry.content(post_content, type="html")
-                    entries.append(entry)
-
-        entries.sort(key=lambda x: x.published(), reverse=False)
-        feed.entry(entries)
-
-        if env.DEBUG:
-            filename = "feed.atom"
-            feed.atom_file(filename, pretty=True)
-            import webbrowser
-
-            webbrowser.open(filename)
-        return feed.atom_str(pretty=env.DEBUG)
-
-    def get_rss(  # noqa: PLR0913
-        self,
+            for story_item in stories:
+                story_link = f"{self.base_url}stories/{self.profile.username}/{story_item.mediaid}/"
+                title = f"{story_item.owner_username} story"
+                post_content = f"{profile_link(story_item.owner_username)} {link(story_link, 'story')}<br>{title}"
+                if story_item.is_video:
+                    post_content += rss_video(self.media_url(story_item.url))
+                else:
+                    post_content += rss_image_story(self.media_url(story_item.url), story_link)
+
+                entries.append(
+                    Entry(
+                        id=story_link,
+                        link=story_link,
+                        author=story_item.owner_username,
+                        title=title,
+                        content=post_content,
+                        published=story_item.date,
+                        source_url=story_link,
+                        source_title=title,
+                    ),
+                )
+
+        entries.sort(key=lambda x: x.published, reverse=False)
+        feed.entries = entries
+        # the feed changes only with its entries, which keeps its content, and so its ETag, stable between builds
+        feed.updated = entries[-1].published if entries else NO_POSTS_DATE
+        with metrics.stage("serialize"):
+            return serializer.atom(feed, env.FEED_SERIALIZER)
+
+    def fetch_section(self, section: str, limit: int | None = None) -> list[PostData] | list[StoryItemData] | None:
+        """Fetch one section of the feed. Errors leave the section out of the feed."""
+        description = SECTIONS[section]
+        try:
+            with metrics.stage(section):
+                return self._fetch_section(section, limit)
+        except Exception as e:  # noqa: BLE001
+            LOG.error(f"Error getting {description} for {self.profile.userid}: {e}")  # noqa: TRY400
+            return None
+
+    def _fetch_section(self, section: str, limit: int | None) -> list[PostData] | list[StoryItemData]:
+        if section == "stories":
+            return self.get_stories()
+
+        LOG.info(f"Getting first {limit} {SECTIONS[section]} for {self.profile.username} ({self.profile.userid})")
+        if section == "posts":
+            return self.get_section(section, self.profile.get_posts(), limit)
+        if section == "reels":
+            return self.get_section(section, self.profile.get_reels(), limit)
+        return self.get_section(section, self.profile.get_tagged_posts(), limit)
+
+    @staticmethod
+    def requested_sections(  # noqa: PLR0913
         posts=True,
         reels=True,
         stories=True,
@@ -205,37 +415,64 @@ class InstagramUserRSS:
         reels_limit=constants.REELS_LIMIT_DEFAULT,
         tagged_limit=constants.TAGGED_LIMIT_DEFAULT,
         dry_run=False,
+    ) -> dict[str, int | None]:
+        """Map the sections to fetch to their limits."""
+        if dry_run:
+            return {}
+
+        sections = {
+            "posts": (posts, posts_limit or constants.POSTS_LIMIT_DEFAULT),
+            "reels": (reels, reels_limit or constants.REELS_LIMIT_DEFAULT),
+            "stories": (stories, None),
+            "tagged": (tagged, tagged_limit or constants.TAGGED_LIMIT_DEFAULT),
+        }
+        return {section: limit for section, (requested, limit) in sections.items() if requested}
+
+    def get_rss(self, **kwargs):
+        sections = self.requested_sections(**kwargs)
+        results = {section: self.fetch_section(section, limit) for section, limit in sections.items()}
+        self.missing_sections = [section for section, result in results.items() if result is None]
+        return self.generate_rss_feed(**results)
+
+    async def get_rss_async(
+        self,
+        run: Callable[..., Awaitable],
+        concurrency: int = constants.SECTION_CONCURRENCY_DEFAULT,
+        section_timeout: float = constants.SECTION_TIMEOUT_DEFAULT,
+        **kwargs,
     ):
-        try:
-            posts = self.profile.get_posts() if posts and not dry_run else None
-        except Exception as e:  # noqa: BLE001
-            LOG.error(f"Error getting posts for {self.profile.userid}: {e}")  # noqa: TRY400
-            posts = None
-
-        try:
-            reels = self.profile.get_reels() if reels and not dry_run else None
-        except Exception as e:  # noqa: BLE001
-            LOG.error(f"Error getting reels for {self.profile.userid}: {e}")  # noqa: TRY400
-            reels = None
-
-        try:
-            stories = self.il.get_stories([self.profile.userid]) if stories and not dry_run else None
-        except Exception as e:  # noqa: BLE001
-            LOG.error(f"Error getting stories for {self.profile.userid}: {e}")  # noqa: TRY400
-            stories = None
-
-        try:
-            tagged = self.profile.get_tagged_posts() if tagged and not dry_run else None
-        except Exception as e:  # noqa: BLE001
-            LOG.error(f"Error getting tagged posts for {self.profile.userid}: {e}")  # noqa: TRY400
-            tagged = None
-
-        return self.generate_rss_feed(
-            posts=posts,
-            posts_limit=posts_limit,
-            reels=reels,
-            reels_limit=reels_limit,
-            stories=stories,
-            tagged=tagged,
-            tagged_limit=tagged_limit,
-        )
+        """
+        Build the feed like get_rss, fetching the sections concurrently through ``run``, e.g. a scrape executor.
+        At most ``concurrency`` sections of this feed are fetched at once. A section that takes longer than
+        ``section_timeout`` seconds once ``run`` started it is left out, so a slow section results in a partial
+        feed instead of a slow one. The sections left out are in ``missing_sections``.
+        """
+        sections = self.requested_sections(**kwargs)
+        semaphore = asyncio.Semaphore(concurrency)
+        loop = asyncio.get_running_loop()
+
+        async def fetch(section: str, limit: int | None):
+            async with semaphore:
+                started = asyncio.Event()
+
+                def fetch_section():
+                    loop.call_soon_threadsafe(started.set)
+                    return self.fetch_section(section, limit)
+
+                # the timeout starts when a worker picks the section up, not while it waits for one
+                job = asyncio.ensure_future(run(fetch_section))
+                picked_up = asyncio.ensure_future(started.wait())
+                await asyncio.wait({job, picked_up}, return_when=asyncio.FIRST_COMPLETED)
+                picked_up.cancel()
+                try:
+                    return await asyncio.wait_for(asyncio.shield(job), section_timeout)
+                except TimeoutError:
+                    LOG.warning(
+                        f"Getting {SECTIONS[section]} for {self.profile.userid} took longer than {section_timeout}s."
+                        f" Leaving them out of the feed",
+                    )
+                    return None
+
+        results = dict(zip(sections, await asyncio.gather(*(fetch(*_) for _ in sections.items())), strict=True))
+        self.missing_sections = [section for section, result in results.items() if result is None]
+        return await run(self.generate_rss_feed, **results)
@@ -0,0 +1,80 @@
+from __future__ import annotations
+import asyncio
+from typing import TYPE_CHECKING, Any
+from global_logger import Log
+from instagram_rss import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Coroutine
+    from instagram_rss.tiered_cache import TieredCache
+    from instagram_rss.models import PostData, StoryItemData, UserStories
+
+LOG = Log.get_logger()
+
+
+class ItemCache:
+    """
+    Second cache tier holding the extracted fields of single posts and story items, keyed by shortcode/mediaid,
+    and the story items of each user, keyed by user id.
+
+    Feed builds run on scrape workers, so the async cache backend is called through the event loop bound in
+    ``bind``. Until then, and on any cache error, every lookup is a miss.
+    """
+
+    def __init__(self, cache: TieredCache, timeout: float = 15):
+        self._cache = cache
+        self._loop: asyncio.AbstractEventLoop | None = None
+        self.timeout = timeout
+
+    def bind(self, loop: asyncio.AbstractEventLoop):
+        self._loop = loop
+
+    def _run(self, coro: Coroutine, default: Any = None) -> Any:
+        if self._loop is None:
+            coro.close()
+            return default
+
+        try:
+            return asyncio.run_coroutine_threadsafe(coro, self._loop).result(timeout=self.timeout)
+        except Exception as e:  # noqa: BLE001
+            LOG.error(f"{type(e)} while accessing the item cache")  # noqa: TRY400
+            return default
+
+    @staticmethod
+    def _count(kind: str, items: list) -> None:
+        hits = sum(1 for _ in items if _ is not None)
+        if hits:
+            metrics.ITEM_CACHE_REQUESTS.inc(kind, "hit", amount=hits)
+        if len(items) - hits:
+            metrics.ITEM_CACHE_REQUESTS.inc(kind, "miss", amount=len(items) - hits)
+
+    def get_post(self, shortcode: str) -> PostData | None:
+        result = self._run(self._cache.get(f"post:{shortcode}"))
+        self._count("post", [result])
+        return result
+
+    def get_posts(self, shortcodes: list[str]) -> list[PostData | None]:
+        if not shortcodes:
+            return []
+        result = self._run(self._cache.multi_get([f"post:{_}" for _ in shortcodes]), [None] * len(shortcodes))
+        self._count("post", result)
+        return result
+
+    def set_post(self, post: PostData):
+        self._run(self._cache.set(f"post:{post.shortcode}", post))
+
+    def get_story_item(self, mediaid: int) -> StoryItemData | None:
+        result = self._run(self._cache.get(f"story:{mediaid}"))
+        self._count("story", [result])
+        return result
+
+    def set_story_item(self, story_item: StoryItemData):
+        self._run(self._cache.set(f"story:{story_item.mediaid}", story_item))
+
+    def get_user_stories(self, user_id: int | str) -> UserStories | None:
+        result = self._run(self._cache.get(f"stories:{user_id}"))
+        self._count("user_stories", [result])
+        return result
+
+    def set_user_stories(self, user_id: int | str, stories: UserStories):
+        self._run(self._cache.set(f"stories:{user_id}", stories))
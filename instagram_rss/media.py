@@ -0,0 +1,204 @@
+from __future__ import annotations
+import asyncio
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+import time
+from collections import OrderedDict
+from pathlib import Path
+from urllib.parse import urlsplit
+import requests
+from global_logger import Log
+from pydantic import BaseModel
+from instagram_rss import metrics
+
+LOG = Log.get_logger()
+MEDIA_HOSTS = ("cdninstagram.com", "fbcdn.net")
+CHUNK_SIZE = 256 * 1024
+
+
+class MediaCacheStats(BaseModel):
+    files: int
+    bytes: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    errors: int
+
+
+def load_secret(filepath: str) -> str:
+    """Read the secret kept in ``filepath``, generating it first if there is none."""
+    path = Path(filepath)
+    try:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        with path.open("x", encoding="utf-8") as f:
+            secret = secrets.token_urlsafe(32)
+            path.chmod(0o600)
+            f.write(secret)
+    except FileExistsError:
+        return path.read_text(encoding="utf-8").strip()
+    except OSError as e:
+        LOG.warning(
+            f"{type(e)} while keeping the media proxy secret in {filepath}: {e}. The proxied URLs of the feeds"
+            f" built until the restart will not be served after it",
+        )
+        return secrets.token_urlsafe(32)
+    return secret
+
+
+def _b64encode(data: bytes) -> str:
+    return base64.urlsafe_b64encode(data).rstrip(b"=").decode()
+
+
+def _b64decode(data: str) -> bytes:
+    return base64.urlsafe_b64decode(data + "=" * (-len(data) % 4))
+
+
+class MediaProxy:
+    """
+    Rewrites the Instagram media URLs of the feeds to ``base_url``/media/..., and serves them from ``dirpath``,
+    which holds at most ``max_bytes`` of media, least recently used first out.
+
+    The rewritten URLs are signed with ``secret``, so the proxy only fetches what the service put into a feed.
+    The files are named after the media URL without its query, which holds the expiring CDN signature,
+    so a medium is fetched once however many builds rewrite it, and is served after its signature expires.
+    """
+
+    def __init__(self, base_url: str, secret: str, dirpath: str, max_bytes: int, timeout: float = 30):
+        self.base_url = base_url.rstrip("/")
+        self._key = hashlib.sha256(secret.encode()).digest()
+        self.dirpath = Path(dirpath)
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        self._files: OrderedDict[str, int] = OrderedDict()  # filename, size
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._inflight: dict[str, asyncio.Task] = {}
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.errors = 0
+        self._load()
+
+    def _load(self):
+        try:
+            self.dirpath.mkdir(parents=True, exist_ok=True)
+            files = sorted(
+                (_.stat().st_mtime, _.name, _.stat().st_size) for _ in self.dirpath.iterdir() if _.suffix != ".part"
+            )
+        except OSError as e:
+            LOG.warning(f"{type(e)} while reading the media cache {self.dirpath}: {e}")
+            return
+
+        for _, name, size in files:
+            self._files[name] = size
+            self._bytes += size
+
+    def _sign(self, data: bytes) -> str:
+        return _b64encode(hmac.new(self._key, data, hashlib.sha256).digest()[:16])
+
+    def url(self, url: str | None) -> str | None:
+        """Rewrite an Instagram media URL to the proxy. Other URLs are left as they are."""
+        if not url:
+            return url
+        split = urlsplit(url)
+        if not split.hostname or not split.hostname.endswith(MEDIA_HOSTS):
+            return url
+        data = url.encode()
+        return f"{self.base_url}/media/{self._sign(data)}/{_b64encode(data)}{Path(split.path).suffix}"
+
+    def verify(self, signature: str, name: str) -> str | None:
+        """Return the media URL of a proxy URL, or None if it is not one that ``url`` made."""
+        payload, _, _ = name.partition(".")
+        try:
+            data = _b64decode(payload)
+        except ValueError:  # binascii.Error included
+            return None
+        if not hmac.compare_digest(signature.encode(), self._sign(data).encode()):  # str needs ASCII
+            return None
+        return data.decode()
+
+    @staticmethod
+    def filename(url: str) -> str:
+        path = urlsplit(url).path
+        return hashlib.blake2b(path.encode(), digest_size=16).hexdigest() + Path(path).suffix
+
+    async def get(self, url: str) -> Path:
+        """Return the cached file of a medium, fetching it first if it is not cached. Concurrent fetches share one."""
+        name = self.filename(url)
+        if self._touch(name):
+            self.hits += 1
+            metrics.MEDIA_REQUESTS.inc("hit")
+            return self.dirpath / name
+
+        task = self._inflight.get(name)
+        if task is None:
+            self.misses += 1
+            metrics.MEDIA_REQUESTS.inc("miss")
+            task = asyncio.ensure_future(asyncio.to_thread(self._fetch, url, name))
+            self._inflight[name] = task
+            task.add_done_callback(lambda _: self._inflight.pop(name, None))
+        try:
+            return await asyncio.shield(task)
+        except Exception:
+            self.errors += 1
+            metrics.MEDIA_REQUESTS.inc("error")
+            raise
+
+    def _touch(self, name: str) -> bool:
+        with self._lock:
+            if name not in self._files:
+                return False
+            self._files.move_to_end(name)
+        try:
+            os.utime(self.dirpath / name)  # keeps the order of use across restarts
+        except FileNotFoundError:
+            with self._lock:
+                self._bytes -= self._files.pop(name, 0)
+            return False
+        return True
+
+    def _fetch(self, url: str, name: str) -> Path:
+        path = self.dirpath / name
+        part = self.dirpath / f"{name}.{threading.get_ident()}.part"
+        started = time.perf_counter()
+        try:
+            with requests.get(url, stream=True, timeout=self.timeout) as response:
+                response.raise_for_status()
+                with part.open("wb") as f:
+                    for chunk in response.iter_content(CHUNK_SIZE):
+                        f.write(chunk)
+            part.replace(path)
+        finally:
+            part.unlink(missing_ok=True)
+        metrics.observe_stage("media", time.perf_counter() - started)
+        self._add(name, path.stat().st_size)
+        return path
+
+    def _add(self, name: str, size: int):
+        evicted = []
+        with self._lock:
+            self._bytes += size - self._files.pop(name, 0)
+            self._files[name] = size
+            while self._bytes > self.max_bytes and len(self._files) > 1:
+                oldest, oldest_size = self._files.popitem(last=False)
+                self._bytes -= oldest_size
+                self.evictions += 1
+                evicted.append(oldest)
+        for _ in evicted:
+            (self.dirpath / _).unlink(missing_ok=True)
+
+    def stats(self) -> MediaCacheStats:
+        return MediaCacheStats(
+            files=len(self._files),
+            bytes=self._bytes,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            errors=self.errors,
+        )
@@ -0,0 +1,174 @@
+from __future__ import annotations
+import pickle
+import time
+from collections import OrderedDict
+from typing import Any
+from aiocache.base import BaseCache
+from aiocache.serializers import NullSerializer
+from pydantic import BaseModel
+
+
+class MemoryCacheStats(BaseModel):
+    entries: int
+    bytes: int
+    max_entries: int
+    max_bytes: int
+    hits: int
+    misses: int
+    evictions: int
+    expirations: int
+
+
+def sizeof(value: Any) -> int:
+    """Approximate the memory an entry takes by its pickled size."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:  # noqa: BLE001
+        return 0
+
+
+class BoundedMemoryCache(BaseCache):
+    """
+    In-process aiocache backend holding at most ``max_entries`` entries and ``max_bytes`` bytes.
+
+    The least recently used entries are evicted to make room. Expired entries are dropped when they are looked up
+    or evicted, instead of by a timer per entry as in aiocache's SimpleMemoryCache.
+    """
+
+    NAME = "bounded_memory"
+
+    def __init__(self, max_entries: int, max_bytes: int, serializer=None, **kwargs):
+        super().__init__(serializer=serializer or NullSerializer(), **kwargs)
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._cache: OrderedDict[str, tuple[Any, float | None, int]] = OrderedDict()  # value, expires_at, size
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+    def _pop(self, key: str) -> tuple[Any, float | None, int] | None:
+        entry = self._cache.pop(key, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    def _lookup(self, key: str) -> Any:
+        entry = self._cache.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        value, expires_at, _ = entry
+        if expires_at is not None and expires_at <= time.monotonic():
+            self._pop(key)
+            self.expirations += 1
+            self.misses += 1
+            return None
+
+        self._cache.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def _store(self, key: str, value: Any, ttl: float | None):
+        size = sizeof(value)
+        self._pop(key)
+        if size > self.max_bytes:
+            self.evictions += 1  # would evict everything else and still not fit
+            return
+
+        while self._cache and (len(self._cache) >= self.max_entries or self._bytes + size > self.max_bytes):
+            _, expires_at, _ = self._pop(next(iter(self._cache)))
+            if expires_at is not None and expires_at <= time.monotonic():
+                self.expirations += 1
+            else:
+                self.evictions += 1
+
+        self._cache[key] = (value, time.monotonic() + ttl if ttl else None, size)
+        self._bytes += size
+
+    async def _get(self, key, encoding="utf-8", _conn=None):  # noqa: ARG002
+        return self._lookup(key)
+
+    async def _gets(self, key, encoding="utf-8", _conn=None):  # noqa: ARG002
+        return self._lookup(key)
+
+    async def _multi_get(self, keys, encoding="utf-8", _conn=None):  # noqa: ARG002
+        return [self._lookup(key) for key in keys]
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, _conn=None):
+        if _cas_token is not None and _cas_token != self._lookup(key):
+            return 0
+
+        self._store(key, value, ttl)
+        return True
+
+    async def _multi_set(self, pairs, ttl=None, _conn=None):
+        for key, value in pairs:
+            self._store(key, value, ttl)
+        return True
+
+    async def _add(self, key, value, ttl=None, _conn=None):
+        if await self._exists(key):
+            msg = f"Key {key} already exists, use .set to update the value"
+            raise ValueError(msg)
+
+        self._store(key, value, ttl)
+        return True
+
+    async def _exists(self, key, _conn=None):
+        entry = self._cache.get(key)
+        return entry is not None and (entry[1] is None or entry[1] > time.monotonic())
+
+    async def _increment(self, key, delta, _conn=None):
+        value = self._lookup(key)
+        try:
+            value = delta if value is None else int(value) + delta
+        except ValueError:
+            msg = "Value is not an integer"
+            raise TypeError(msg) from None
+
+        entry = self._cache.get(key)
+        self._store(key, value, entry[1] - time.monotonic() if entry and entry[1] is not None else None)
+        return value
+
+    async def _expire(self, key, ttl, _conn=None):
+        entry = self._cache.get(key)
+        if entry is None:
+            return False
+
+        self._cache[key] = (entry[0], time.monotonic() + ttl if ttl else None, entry[2])
+        return True
+
+    async def _delete(self, key, _conn=None):
+        return 1 if self._pop(key) is not None else 0
+
+    async def _clear(self, namespace=None, _conn=None):
+        if namespace:
+            for key in [_ for _ in self._cache if _.startswith(namespace)]:
+                self._pop(key)
+        else:
+            self._cache.clear()
+            self._bytes = 0
+        return True
+
+    async def _raw(self, command, *args, encoding="utf-8", _conn=None, **kwargs):  # noqa: ARG002
+        return getattr(self._cache, command)(*args, **kwargs)
+
+    async def _redlock_release(self, key, value):
+        if self._lookup(key) == value:
+            return await self._delete(key)
+        return 0
+
+    def stats(self) -> MemoryCacheStats:
+        return MemoryCacheStats(
+            entries=len(self._cache),
+            bytes=self._bytes,
+            max_entries=self.max_entries,
+            max_bytes=self.max_bytes,
+            hits=self.hits,
+            misses=self.misses,
+            evictions=self.evictions,
+            expirations=self.expirations,
+        )
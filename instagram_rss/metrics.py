@@ -0,0 +1,237 @@
+from __future__ import annotations
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from typing import TYPE_CHECKING, TypeVar
+from global_logger import Log
+
+if TYPE_CHECKING:
+    from collections.abc import Callable, Iterator
+    from starlette.types import ASGIApp, Receive, Scope, Send
+
+LOG = Log.get_logger()
+T = TypeVar("T")
+BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60, 120)
+UPSTREAM_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+
+
+def _labels(names: tuple[str, ...], values: tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{value}"' for name, value in zip(names, values, strict=True)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+class Counter:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self._values: dict[tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} counter"
+        with self._lock:
+            values = dict(self._values)
+        for labels, value in sorted(values.items()):
+            yield f"{self.name}{_labels(self.labels, labels)} {value}"
+
+
+class Histogram:
+    def __init__(self, name: str, documentation: str, labels: tuple[str, ...] = (), buckets: tuple = BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = labels
+        self.buckets = buckets
+        self._values: dict[tuple[str, ...], tuple[list[int], float, int]] = {}  # bucket counts, sum, count
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            counts, total, count = self._values.get(labels) or ([0] * len(self.buckets), 0.0, 0)
+            for i, bucket in enumerate(self.buckets):
+                if value <= bucket:
+                    counts[i] += 1
+            self._values[labels] = (counts, total + value, count + 1)
+
+    def render(self) -> Iterator[str]:
+        yield f"# HELP {self.name} {self.documentation}"
+        yield f"# TYPE {self.name} histogram"
+        with self._lock:
+            values = {labels: (list(counts), total, count) for labels, (counts, total, count) in self._values.items()}
+        for labels, (counts, total, count) in sorted(values.items()):
+            for bucket, bucket_count in zip(self.buckets, counts, strict=True):
+                le = f'le="{bucket}"'
+                yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {bucket_count}"
+            le = 'le="+Inf"'
+            yield f"{self.name}_bucket{_labels(self.labels, labels, le)} {count}"
+            yield f"{self.name}_sum{_labels(self.labels, labels)} {total}"
+            yield f"{self.name}_count{_labels(self.labels, labels)} {count}"
+
+
+REQUEST_SECONDS = Histogram("instagram_rss_request_seconds", "Duration of the HTTP requests.", ("route",))
+STAGE_SECONDS = Histogram("instagram_rss_stage_seconds", "Duration of the stages of the feed requests.", ("stage",))
+FEED_CACHE_REQUESTS = Counter("instagram_rss_feed_cache_requests_total", "Feed cache lookups.", ("result",))
+ITEM_CACHE_REQUESTS = Counter("instagram_rss_item_cache_requests_total", "Item cache lookups.", ("kind", "result"))
+CACHE_FALLBACKS = Counter(
+    "instagram_rss_cache_fallbacks_total",
+    "Cache operations that skipped redis, because it failed or its circuit breaker was open.",
+    ("cache", "operation"),
+)
+UPSTREAM_REQUESTS = Counter("instagram_rss_upstream_requests_total", "Requests to Instagram.", ("query_type",))
+EXTRACTIONS = Counter(
+    "instagram_rss_extractions_total",
+    "Posts and story items extracted from their list node alone (lean) or through more requests (full).",
+    ("kind", "mode"),
+)
+MEDIA_REQUESTS = Counter("instagram_rss_media_requests_total", "Media proxy requests.", ("result",))
+FEED_UPSTREAM_REQUESTS = Histogram(
+    "instagram_rss_feed_upstream_requests",
+    "Requests to Instagram per feed build.",
+    buckets=UPSTREAM_BUCKETS,
+)
+METRICS = (
+    REQUEST_SECONDS,
+    STAGE_SECONDS,
+    FEED_CACHE_REQUESTS,
+    ITEM_CACHE_REQUESTS,
+    CACHE_FALLBACKS,
+    UPSTREAM_REQUESTS,
+    EXTRACTIONS,
+    MEDIA_REQUESTS,
+    FEED_UPSTREAM_REQUESTS,
+)
+
+
+def render() -> str:
+    """Render all metrics in the Prometheus text exposition format."""
+    return "\n".join(line for metric in METRICS for line in metric.render()) + "\n"
+
+
+class Trace:
+    """The stage durations and the upstream requests of one request, added up across threads."""
+
+    def __init__(self):
+        self.started = time.monotonic()
+        self.stages: dict[str, float] = {}
+        self.upstream = 0
+        self._lock = threading.Lock()
+
+    def add(self, stage: str, seconds: float):
+        with self._lock:
+            self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+
+    def add_upstream(self):
+        with self._lock:
+            self.upstream += 1
+
+    def merge(self, other: Trace):
+        with other._lock:
+            stages = dict(other.stages)
+            upstream = other.upstream
+        with self._lock:
+            for stage, seconds in stages.items():
+                self.stages[stage] = self.stages.get(stage, 0.0) + seconds
+            self.upstream += upstream
+
+    @property
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def breakdown(self) -> str:
+        with self._lock:
+            stages = sorted(self.stages.items(), key=lambda _: _[1], reverse=True)
+            upstream = self.upstream
+        return ", ".join([*(f"{stage} {seconds:.3f}s" for stage, seconds in stages), f"{upstream} upstream requests"])
+
+
+_trace: ContextVar[Trace | None] = ContextVar("trace", default=None)
+
+
+@contextmanager
+def trace(*, new: bool = False) -> Iterator[Trace]:
+    """
+    Trace the stages run within the block, in this context and the ones copied from it, e.g. by ScrapeExecutor.
+    The block joins the trace of the context, if any, unless ``new``: then it gets a trace of its own,
+    e.g. for one feed build of a /batch request, which is added to the trace of the context at the end.
+    """
+    parent = _trace.get()
+    if parent is not None and not new:
+        yield parent
+        return
+
+    current = Trace()
+    token = _trace.set(current)
+    try:
+        yield current
+    finally:
+        _trace.reset(token)
+        if parent is not None:
+            parent.merge(current)
+
+
+def observe_stage(stage: str, seconds: float):
+    STAGE_SECONDS.observe(seconds, stage)
+    current = _trace.get()
+    if current is not None:
+        current.add(stage, seconds)
+
+
+@contextmanager
+def stage(name: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        observe_stage(name, time.perf_counter() - started)
+
+
+def timed(name: str, fn: Callable[..., T]) -> Callable[..., T]:  # noqa: UP047
+    """Wrap ``fn`` into a stage, e.g. to time it on a scrape worker only, without the wait for the worker."""
+
+    @wraps(fn)
+    def wrapper(*args, **kwargs) -> T:
+        with stage(name):
+            return fn(*args, **kwargs)
+
+    return wrapper
+
+
+def upstream_request(query_type: str):
+    UPSTREAM_REQUESTS.inc(query_type)
+    current = _trace.get()
+    if current is not None:
+        current.add_upstream()
+
+
+class TraceMiddleware:
+    """
+    Time the HTTP requests by route, with the breakdown of the slow ones by stage in the log.
+
+    A plain ASGI middleware: ``@app.middleware("http")`` runs every request in a task of its own, which costs
+    more than serving a cached feed.
+    """
+
+    def __init__(self, app: ASGIApp, slow_request_seconds: float):
+        self.app = app
+        self.slow_request_seconds = slow_request_seconds
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        with trace() as current:
+            await self.app(scope, receive, send)
+        route = scope.get("route")
+        REQUEST_SECONDS.observe(current.elapsed, route.path if route else "unmatched")
+        if current.elapsed > self.slow_request_seconds:
+            LOG.warning(f"Slow request {scope['path']} took {current.elapsed:.2f}s: {current.breakdown()}")
@@ -0,0 +1,105 @@
+from __future__ import annotations
+import gzip
+import hashlib
+import time
+from dataclasses import dataclass, field
+from typing import TYPE_CHECKING
+from instagram_rss import env
+
+if TYPE_CHECKING:
+    from datetime import datetime
+
+
+@dataclass
+class CachedFeed:
+    """
+    A built feed, stored gzip-compressed once so that it is served as is to the readers that accept gzip.
+
+    ``etag`` hashes the uncompressed content, ``last_modified`` is when the content last changed:
+    the build time, or that of the previous build if the content is the same. A ``partial`` feed misses
+    a section and stays fresh for ``PARTIAL_CACHE_DURATION`` only, so that it is rebuilt soon.
+    """
+
+    gzip: bytes
+    etag: str
+    built_at: float = field(default_factory=time.time)
+    last_modified: float | None = None
+    partial: bool = False
+
+    @classmethod
+    def from_content(
+        cls,
+        content: str | bytes,
+        previous: CachedFeed | None = None,
+        *,
+        partial: bool = False,
+    ) -> CachedFeed:
+        data = content.encode() if isinstance(content, str) else content
+        etag = hashlib.blake2b(data, digest_size=16).hexdigest()
+        built_at = time.time()
+        unchanged = previous is not None and previous.etag == etag and previous.last_modified is not None
+        return cls(
+            gzip=gzip.compress(data, mtime=0),
+            etag=etag,
+            built_at=built_at,
+            last_modified=previous.last_modified if unchanged else built_at,
+            partial=partial,
+        )
+
+    @property
+    def content(self) -> str:
+        return gzip.decompress(self.gzip).decode()
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.built_at
+
+    @property
+    def ttl(self) -> int:
+        return env.PARTIAL_CACHE_DURATION if self.partial else env.CACHE_DURATION
+
+    @property
+    def is_fresh(self) -> bool:
+        return self.age < self.ttl
+
+
+@dataclass
+class MediaData:
+    url: str | None
+    is_video: bool
+
+
+@dataclass
+class PostData:
+    """The fields of an instaloader Post that a feed entry is rendered from."""
+
+    shortcode: str
+    owner_username: str
+    caption: str | None
+    date: datetime
+    typename: str
+    media: list[MediaData] = field(default_factory=list)
+    tagged_users: list[str] = field(default_factory=list)
+
+
+@dataclass
+class StoryItemData:
+    """The fields of an instaloader StoryItem that a feed entry is rendered from."""
+
+    mediaid: int
+    owner_username: str
+    date: datetime
+    is_video: bool
+    url: str | None
+
+
+@dataclass
+class UserStories:
+    """The story items of one user, and when they were fetched, so that builds can tell if they are recent enough."""
+
+    items: list[StoryItemData]
+    fetched_at: float = field(default_factory=time.time)
+
+    @property
+    def age(self) -> float:
+        return time.time() - self.fetched_at
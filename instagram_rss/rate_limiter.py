@@ -0,0 +1,199 @@
+from __future__ import annotations
+import threading
+import time
+from typing import TYPE_CHECKING
+from global_logger import Log
+from instaloader import RateController
+from pydantic import BaseModel
+from redis import Redis
+from redis.exceptions import RedisError
+from instagram_rss import metrics
+
+if TYPE_CHECKING:
+    from instaloader import InstaloaderContext
+
+LOG = Log.get_logger()
+BACKOFF_MIN = 30
+BACKOFF_MAX = 30 * 60
+BACKOFF_DECAY_AFTER = 4  # halve the backoff after this many backoffs without another 429
+
+# refills the bucket, then either takes a token (returns 0) or returns the seconds to wait for one
+TAKE_SCRIPT = """
+local now = tonumber(ARGV[1])
+local rate = tonumber(ARGV[2])
+local burst = tonumber(ARGV[3])
+local tokens = tonumber(redis.call('HGET', KEYS[1], 'tokens') or burst)
+local updated = tonumber(redis.call('HGET', KEYS[1], 'updated') or now)
+local paused_until = tonumber(redis.call('HGET', KEYS[1], 'paused_until') or 0)
+tokens = math.min(burst, tokens + math.max(0, now - updated) * rate)
+local wait = 0
+if now < paused_until then
+    wait = paused_until - now
+elseif tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait = (1 - tokens) / rate
+end
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated', tostring(now))
+redis.call('EXPIRE', KEYS[1], 86400)
+return {tostring(wait), tostring(tokens)}
+"""
+PAUSE_SCRIPT = """
+local paused_until = tonumber(redis.call('HGET', KEYS[1], 'paused_until') or 0)
+redis.call('HSET', KEYS[1], 'paused_until', tostring(math.max(paused_until, tonumber(ARGV[1]))))
+redis.call('EXPIRE', KEYS[1], 86400)
+"""
+
+
+class RateLimiterStats(BaseModel):
+    tokens: float
+    rate_per_minute: int
+    burst: int
+    throttled: int
+    throttled_seconds: float
+    too_many_requests: int
+    backoff: float
+    paused_for: float
+
+
+class TokenBucket:
+    """
+    Token bucket for the requests to Instagram: ``rate_per_minute`` requests, bursts of up to ``burst``.
+
+    On a 429 response the bucket pauses for an adaptive backoff, which doubles with every 429 and decays
+    while Instagram accepts the requests again.
+    """
+
+    def __init__(self, rate_per_minute: int, burst: int):
+        self.rate_per_minute = rate_per_minute
+        self.burst = burst
+        self._lock = threading.Lock()
+        self._tokens = float(burst)
+        self._updated = time.time()
+        self._paused_until = 0.0
+        self.throttled = 0
+        self.throttled_seconds = 0.0
+        self.too_many_requests = 0
+        self.backoff = 0.0
+        self._backoff_at = 0.0
+
+    @property
+    def rate(self) -> float:
+        return self.rate_per_minute / 60
+
+    def _take(self, now: float) -> float:
+        with self._lock:
+            self._tokens = min(self.burst, self._tokens + max(0.0, now - self._updated) * self.rate)
+            self._updated = now
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return 0.0
+            return (1 - self._tokens) / self.rate
+
+    def _pause(self, until: float):
+        with self._lock:
+            self._paused_until = max(self._paused_until, until)
+
+    def acquire(self) -> float:
+        """Block until a request may be made. Returns the seconds waited."""
+        waited = 0.0
+        while (wait := self._take(time.time())) > 0:
+            time.sleep(wait)
+            waited += wait
+        if waited:
+            with self._lock:
+                self.throttled += 1
+                self.throttled_seconds += waited
+        self._decay_backoff()
+        return waited
+
+    def _decay_backoff(self):
+        with self._lock:
+            if self.backoff and time.time() - self._backoff_at > self.backoff * BACKOFF_DECAY_AFTER:
+                self.backoff = self.backoff / 2 if self.backoff / 2 >= BACKOFF_MIN else 0.0
+                self._backoff_at = time.time()
+
+    def too_many(self):
+        """Back off after a 429 response."""
+        with self._lock:
+            self.too_many_requests += 1
+            self.backoff = min(BACKOFF_MAX, self.backoff * 2 if self.backoff else BACKOFF_MIN)
+            self._backoff_at = time.time()
+            backoff = self.backoff
+        LOG.warning(f"Instagram responded with 429. Pausing all requests for {backoff:.0f}s")
+        self._pause(time.time() + backoff)
+
+    @property
+    def tokens(self) -> float:
+        with self._lock:
+            return min(self.burst, self._tokens + max(0.0, time.time() - self._updated) * self.rate)
+
+    @property
+    def paused_for(self) -> float:
+        return max(0.0, self._paused_until - time.time())
+
+    def stats(self) -> RateLimiterStats:
+        return RateLimiterStats(
+            tokens=self.tokens,
+            rate_per_minute=self.rate_per_minute,
+            burst=self.burst,
+            throttled=self.throttled,
+            throttled_seconds=self.throttled_seconds,
+            too_many_requests=self.too_many_requests,
+            backoff=self.backoff,
+            paused_for=self.paused_for,
+        )
+
+
+class RedisTokenBucket(TokenBucket):
+    """TokenBucket kept in Redis, so that all replicas share one budget. Falls back to memory on Redis errors."""
+
+    def __init__(self, redis_url: str, rate_per_minute: int, burst: int, key: str = "instagram_rate_limit"):
+        super().__init__(rate_per_minute=rate_per_minute, burst=burst)
+        self.key = key
+        self._redis = Redis.from_url(redis_url, socket_timeout=5)
+        self._take_script = self._redis.register_script(TAKE_SCRIPT)
+        self._pause_script = self._redis.register_script(PAUSE_SCRIPT)
+        self._shared_tokens: float | None = None
+
+    def _take(self, now: float) -> float:
+        try:
+            wait, tokens = self._take_script(keys=[self.key], args=[now, self.rate, self.burst])
+        except RedisError as e:
+            LOG.error(f"{type(e)} while taking a rate limit token from redis")  # noqa: TRY400
+            self._shared_tokens = None
+            return super()._take(now)
+
+        self._shared_tokens = float(tokens)
+        return float(wait)
+
+    def _pause(self, until: float):
+        super()._pause(until)
+        try:
+            self._pause_script(keys=[self.key], args=[until])
+        except RedisError as e:
+            LOG.error(f"{type(e)} while pausing the rate limit in redis")  # noqa: TRY400
+
+    @property
+    def tokens(self) -> float:
+        return self._shared_tokens if self._shared_tokens is not None else super().tokens
+
+
+class SharedRateController(RateController):
+    """Instaloader RateController that also takes every request to Instagram from a shared TokenBucket."""
+
+    def __init__(self, context: InstaloaderContext, bucket: TokenBucket):
+        super().__init__(context)
+        self._bucket = bucket
+
+    def wait_before_query(self, query_type: str):
+        metrics.upstream_request(query_type)
+        with metrics.stage("rate_limit"):
+            super().wait_before_query(query_type)
+            self._bucket.acquire()
+
+    def handle_429(self, query_type: str):
+        self._bucket.too_many()
+        super().handle_429(query_type)
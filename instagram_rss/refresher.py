@@ -0,0 +1,152 @@
+from __future__ import annotations
+import asyncio
+import random
+import time
+from dataclasses import dataclass
+from typing import TYPE_CHECKING
+from global_logger import Log
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+    from instagram_rss.models import CachedFeed
+
+LOG = Log.get_logger()
+TICK_SECONDS = 5
+REFRESH_AT_MIN = 0.8  # refresh between 80% and 95% of the feed lifetime, so refreshes spread out
+REFRESH_AT_MAX = 0.95
+
+
+@dataclass
+class HotFeed:
+    user_id: str
+    options: dict
+    last_access: float
+    built_at: float = 0.0
+    refresh_at: float = 0.0
+
+
+class FeedRefresher:
+    """
+    Keeps recently requested feeds warm.
+
+    Every feed read is recorded with ``touch``. A background task rebuilds the hot feeds shortly before
+    they expire, at a jittered moment and within ``budget_per_minute`` rebuilds. Feeds that expire anyway
+    are served stale and rebuilt by ``revalidate``, within the same budget.
+    """
+
+    def __init__(
+        self,
+        build: Callable[[str, HotFeed], Awaitable[CachedFeed]],
+        get: Callable[[str], Awaitable[CachedFeed | None]],
+        ttl: int,
+        hot_window: int,
+        budget_per_minute: int,
+    ):
+        self._build = build
+        self._get = get
+        self.ttl = ttl
+        self.hot_window = hot_window
+        self.budget_per_minute = budget_per_minute
+        self.feeds: dict[str, HotFeed] = {}
+        self._tasks: set[asyncio.Task] = set()
+        self._runner: asyncio.Task | None = None
+        self._budget_left = budget_per_minute
+        self._budget_reset_at = 0.0
+
+    def touch(self, key: str, user_id: str, options: dict, built_at: float | None = None, ttl: float | None = None):
+        now = time.time()
+        feed = self.feeds.get(key)
+        if feed is None:
+            feed = self.feeds[key] = HotFeed(user_id=user_id, options=options, last_access=now)
+        feed.last_access = now
+        if built_at:
+            self.schedule(key, built_at, ttl=ttl)
+
+    def schedule(self, key: str, built_at: float, *, force: bool = False, ttl: float | None = None):
+        """Schedule the refresh of a feed built at ``built_at`` before its ``ttl``, by default the one of full feeds."""
+        feed = self.feeds.get(key)
+        if feed is None or (built_at <= feed.built_at and not force):
+            return
+
+        feed.built_at = max(feed.built_at, built_at)
+        feed.refresh_at = feed.built_at + (ttl or self.ttl) * random.uniform(REFRESH_AT_MIN, REFRESH_AT_MAX)  # noqa: S311
+
+    def revalidate(self, key: str):
+        """
+        Rebuild a stale feed in the background while the stale copy keeps being served, unless it is being
+        rebuilt already, its last rebuild failed a moment ago, or the budget is exhausted.
+        """
+        now = time.time()
+        feed = self.feeds.get(key)
+        if feed is None or feed.refresh_at > now:
+            return
+        if not self._take_budget(now):
+            LOG.debug(f"Refresh budget exhausted. Serving {key} stale")
+            return
+        self._spawn(key, feed)
+
+    def _spawn(self, key: str, feed: HotFeed):
+        feed.refresh_at = float("inf")  # until the rebuild reschedules it
+        task = asyncio.create_task(self._refresh(key, feed))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+
+    async def _refresh(self, key: str, feed: HotFeed):
+        try:
+            cached = await self._get(key)
+            if cached and cached.built_at > feed.built_at and cached.is_fresh:
+                LOG.debug(f"{key} was already refreshed elsewhere")
+                built = cached
+            else:
+                LOG.debug(f"Refreshing {key}")
+                built = await self._build(key, feed)
+            self.schedule(key, built.built_at, force=True, ttl=built.ttl)
+        except Exception:
+            LOG.exception(f"Error refreshing {key}")
+            feed.refresh_at = time.time() + self.ttl * (1 - REFRESH_AT_MAX)  # retry later, within the budget
+
+    def _take_budget(self, now: float) -> bool:
+        if now >= self._budget_reset_at:
+            self._budget_left = self.budget_per_minute
+            self._budget_reset_at = now + 60
+        if self._budget_left <= 0:
+            return False
+
+        self._budget_left -= 1
+        return True
+
+    def tick(self):
+        now = time.time()
+        for key, feed in list(self.feeds.items()):
+            if now - feed.last_access > self.hot_window:
+                LOG.debug(f"{key} is not requested anymore. Not refreshing it")
+                del self.feeds[key]
+
+        due = sorted(
+            ((key, feed) for key, feed in self.feeds.items() if feed.refresh_at and feed.refresh_at <= now),
+            key=lambda item: item[1].refresh_at,
+        )
+        for key, feed in due:
+            if not self._take_budget(now):
+                LOG.debug(f"Refresh budget exhausted. {len(due)} feeds are due")
+                break
+            self._spawn(key, feed)
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(TICK_SECONDS)
+            try:
+                self.tick()
+            except Exception:
+                LOG.exception("Error in the feed refresher")
+
+    def start(self):
+        if self.budget_per_minute > 0 and self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        tasks = [*self._tasks, self._runner] if self._runner else [*self._tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._runner = None
@@ -0,0 +1,85 @@
+from __future__ import annotations
+import asyncio
+import contextvars
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import TYPE_CHECKING, Any
+from global_logger import Log
+from pydantic import BaseModel
+from instagram_rss import metrics
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+
+LOG = Log.get_logger()
+SLOW_WAIT_SECONDS = 1
+
+
+class ScrapeExecutorStats(BaseModel):
+    max_workers: int
+    queued: int
+    running: int
+    completed: int
+    wait_time_avg: float
+    wait_time_max: float
+
+
+class ScrapeExecutor:
+    """Bounded thread pool for the blocking Instaloader calls, so the event loop keeps serving cache hits."""
+
+    def __init__(self, max_workers: int):
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="scrape")
+        self._lock = threading.Lock()
+        self.queued = 0
+        self.running = 0
+        self.completed = 0
+        self.wait_time_total = 0.0
+        self.wait_time_max = 0.0
+
+    def _call(self, submitted_at: float, fn: Callable, *args, **kwargs) -> Any:
+        wait_time = time.monotonic() - submitted_at
+        with self._lock:
+            self.queued -= 1
+            self.running += 1
+            self.wait_time_total += wait_time
+            self.wait_time_max = max(self.wait_time_max, wait_time)
+        metrics.observe_stage("scrape_wait", wait_time)
+        if wait_time > SLOW_WAIT_SECONDS:
+            LOG.debug(f"{getattr(fn, '__name__', fn)} waited {wait_time:.2f}s for a scrape worker")
+        try:
+            return fn(*args, **kwargs)
+        finally:
+            with self._lock:
+                self.running -= 1
+                self.completed += 1
+
+    def _on_done(self, future: Future):
+        if future.cancelled():  # never started, so _call did not leave the queue
+            with self._lock:
+                self.queued -= 1
+
+    async def run(self, fn: Callable, *args, **kwargs) -> Any:
+        """Run a blocking callable on the scrape pool and await its result, in a copy of the current context."""
+        with self._lock:
+            self.queued += 1
+        context = contextvars.copy_context()
+        future = self._executor.submit(context.run, self._call, time.monotonic(), fn, *args, **kwargs)
+        future.add_done_callback(self._on_done)
+        return await asyncio.wrap_future(future)
+
+    def stats(self) -> ScrapeExecutorStats:
+        with self._lock:
+            started = self.running + self.completed
+            return ScrapeExecutorStats(
+                max_workers=self.max_workers,
+                queued=self.queued,
+                running=self.running,
+                completed=self.completed,
+                wait_time_avg=self.wait_time_total / started if started else 0.0,
+                wait_time_max=self.wait_time_max,
+            )
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
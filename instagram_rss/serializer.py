@@ -0,0 +1,219 @@
+from __future__ import annotations
+import re
+from dataclasses import dataclass, field
+from datetime import datetime
+from email.utils import format_datetime
+from typing import TYPE_CHECKING
+from zoneinfo import ZoneInfo
+from feedgen.entry import FeedEntry
+from feedgen.feed import FeedGenerator
+from instagram_rss import env
+
+if TYPE_CHECKING:
+    from collections.abc import Iterator
+
+# characters XML 1.0 does not allow, which lxml refuses and the fast serializer drops
+XML_INVALID_RE = re.compile("[\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+TEXT_SPECIAL_RE = re.compile("[&<>\r\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]")
+ATTRIBUTE_SPECIAL_RE = re.compile('[&<>"\r\n\t\x00-\x08\x0b\x0c\x0e-\x1f\ud800-\udfff\ufffe\uffff]')
+# the parts of a written Atom feed that merging feeds needs. Escaped content can not contain the tags
+ATOM_ENTRY_RE = re.compile(r"<entry>.*?</entry>", re.DOTALL)
+ATOM_ID_RE = re.compile(r"<id>(.*?)</id>", re.DOTALL)
+ATOM_TITLE_RE = re.compile(r"<title>(.*?)</title>", re.DOTALL)
+ATOM_AUTHOR_RE = re.compile(r"<name>(.*?)</name>", re.DOTALL)
+ATOM_PUBLISHED_RE = re.compile(r"<published>(.*?)</published>", re.DOTALL)
+
+
+@dataclass
+class Entry:
+    id: str
+    title: str
+    content: str
+    published: datetime
+    author: str | None = None
+    link: str | None = None
+    content_type: str | None = "html"
+    source_url: str | None = None
+    source_title: str | None = None
+
+
+@dataclass
+class Feed:
+    """Serializer-neutral feed: what ``InstagramUserRSS`` and the error feeds render."""
+
+    id: str
+    title: str
+    description: str
+    link: str | None = None
+    image: str | None = None
+    updated: datetime | None = None
+    entries: list[Entry] = field(default_factory=list)
+
+
+@dataclass
+class AtomEntry:
+    """An entry of a written Atom feed, kept as written. ``own`` is whether the author is the feed's user."""
+
+    id: str
+    published: datetime
+    xml: str
+    own: bool
+
+
+@dataclass
+class Outline:
+    text: str
+    xml_url: str
+    html_url: str | None = None
+
+
+def text(value: str) -> str:
+    """Escape character data like lxml does. Most strings need no escaping, which one regex search tells."""
+    if not TEXT_SPECIAL_RE.search(value):
+        return value
+    if XML_INVALID_RE.search(value):
+        value = XML_INVALID_RE.sub("", value)
+    return value.replace("&", "&amp;").replace("<", "&lt;").replace(">", "&gt;").replace("\r", "&#13;")
+
+
+def attribute(value: str) -> str:
+    """Escape an attribute value like lxml does."""
+    if not ATTRIBUTE_SPECIAL_RE.search(value):
+        return value
+    return text(value).replace('"', "&quot;").replace("\n", "&#10;").replace("\t", "&#9;")
+
+
+def atom_head(feed: Feed) -> str:
+    """Write the Atom feed up to its first entry."""
+    updated = (feed.updated or datetime.now(tz=ZoneInfo(env.TZ))).isoformat()
+    link = f'<link href="{attribute(feed.link)}"/>' if feed.link else ""
+    image = f"<icon>{text(feed.image)}</icon><logo>{text(feed.image)}</logo>" if feed.image else ""
+    return (
+        "<?xml version='1.0' encoding='UTF-8'?>\n"
+        f'<feed xmlns="http://www.w3.org/2005/Atom"><id>{text(feed.id)}</id><title>{text(feed.title)}</title>'
+        f"<updated>{updated}</updated>{link}{image}<subtitle>{text(feed.description)}</subtitle>"
+    )
+
+
+def iter_atom(feed: Feed) -> Iterator[str]:
+    """Write the feed as Atom, an entry at a time, with the elements in the order feedgen writes them."""
+    yield atom_head(feed)
+    for entry in feed.entries:
+        published = entry.published.isoformat()
+        author = f"<author><name>{text(entry.author)}</name></author>" if entry.author else ""
+        content_type = f' type="{attribute(entry.content_type)}"' if entry.content_type else ""
+        link = f'<link href="{attribute(entry.link)}"/>' if entry.link else ""
+        source = ""
+        if entry.source_url:
+            source = (
+                f"<source><title>{text(entry.source_title or '')}</title>"
+                f'<link href="{attribute(entry.source_url)}"/></source>'
+            )
+        yield (
+            f"<entry><id>{text(entry.id)}</id><title>{text(entry.title)}</title><updated>{published}</updated>"
+            f"{author}<content{content_type}>{text(entry.content)}</content>{link}"
+            f"<published>{published}</published>{source}</entry>"
+        )
+    yield "</feed>"
+
+
+def atom_entries(content: str) -> list[AtomEntry]:
+    """Split an Atom feed written by either serializer into its entries, without parsing the XML."""
+    head, _, _ = content.partition("<entry>")
+    title = ATOM_TITLE_RE.search(head)
+    result = []
+    for match in ATOM_ENTRY_RE.finditer(content):
+        xml = match.group()
+        author = ATOM_AUTHOR_RE.search(xml)
+        result.append(
+            AtomEntry(
+                id=ATOM_ID_RE.search(xml).group(1),
+                published=datetime.fromisoformat(ATOM_PUBLISHED_RE.search(xml).group(1)),
+                xml=xml,
+                own=bool(title and author and author.group(1) == title.group(1)),
+            ),
+        )
+    return result
+
+
+def merge_atom(feed: Feed, contents: list[str]) -> bytes:
+    """
+    Merge Atom feeds into ``feed``, oldest entry first like the feeds of a single user.
+    An entry in several feeds, e.g. a post of one user that is a tagged post of another, is taken once, from the
+    feed of its author if it is there.
+    """
+    entries: dict[str, AtomEntry] = {}
+    for content in contents:
+        for entry in atom_entries(content):
+            known = entries.get(entry.id)
+            if known is None or (entry.own and not known.own):
+                entries[entry.id] = entry
+
+    merged = sorted(entries.values(), key=lambda _: _.published)
+    if merged and feed.updated is None:
+        feed.updated = merged[-1].published
+    return "".join([atom_head(feed), *(_.xml for _ in merged), "</feed>"]).encode()
+
+
+def opml(title: str, outlines: list[Outline]) -> bytes:
+    """Write a subscription list as OPML 2.0."""
+    result = [
+        "<?xml version='1.0' encoding='UTF-8'?>\n",
+        f'<opml version="2.0"><head><title>{text(title)}</title>',
+        f"<dateCreated>{format_datetime(datetime.now(tz=ZoneInfo(env.TZ)))}</dateCreated></head><body>",
+    ]
+    for outline in outlines:
+        html_url = f' htmlUrl="{attribute(outline.html_url)}"' if outline.html_url else ""
+        result.append(
+            f'<outline type="rss" text="{attribute(outline.text)}" title="{attribute(outline.text)}"'
+            f' xmlUrl="{attribute(outline.xml_url)}"{html_url}/>',
+        )
+    result.append("</body></opml>")
+    return "".join(result).encode()
+
+
+def feedgen_atom(feed: Feed, *, pretty: bool = False) -> bytes:
+    """Write the feed as Atom through feedgen."""
+    feed_generator = FeedGenerator()
+    feed_generator.id(feed.id)
+    feed_generator.title(feed.title)
+    feed_generator.description(feed.description)
+    if feed.link:
+        feed_generator.link(href=feed.link)
+    if feed.image:
+        feed_generator.icon(feed.image)
+        feed_generator.logo(feed.image)
+    if feed.updated:
+        feed_generator.updated(feed.updated)
+
+    entries = []
+    for entry in feed.entries:
+        feed_entry = FeedEntry()
+        feed_entry.id(entry.id)
+        if entry.link:
+            feed_entry.link(href=entry.link)
+        if entry.author:
+            feed_entry.author(name=entry.author)
+        feed_entry.title(entry.title)
+        if entry.source_url:
+            feed_entry.source(url=entry.source_url, title=entry.source_title)
+        feed_entry.published(entry.published)
+        feed_entry.updated(entry.published)
+        feed_entry.content(entry.content, type=entry.content_type)
+        entries.append(feed_entry)
+    feed_generator.entry(entries)
+    return feed_generator.atom_str(pretty=pretty)
+
+
+def atom(feed: Feed, serializer: str = "fast") -> bytes:
+    """Write the feed as Atom with the ``fast`` serializer, or with ``feedgen``."""
+    content = feedgen_atom(feed, pretty=env.DEBUG) if serializer == "feedgen" else "".join(iter_atom(feed)).encode()
+
+    if env.DEBUG:
+        filename = "feed.atom"
+        with open(filename, "wb") as f:  # noqa: PTH123
+            f.write(content)
+        import webbrowser
+
+        webbrowser.open(filename)
+    return content
@@ -0,0 +1,261 @@
+from __future__ import annotations
+import asyncio
+import shutil
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import TYPE_CHECKING
+from global_logger import Log
+from instaloader import Instaloader, TwoFactorAuthRequiredException
+from pydantic import BaseModel
+from pyotp import TOTP
+from instagram_rss import env
+from instagram_rss.exceptions import NoSessionAvailableError
+
+if TYPE_CHECKING:
+    from collections.abc import Callable
+    from instaloader import InstaloaderContext, RateController
+
+LOG = Log.get_logger()
+VALIDATION_TICK_SECONDS = 60
+
+
+@dataclass
+class Account:
+    username: str
+    password: str
+    otp: str | None = None
+    session_filepath: str | None = None
+
+
+def accounts_from_env() -> list[Account]:
+    """List the IG_USERNAME account and the IG_ACCOUNTS ones, saving their sessions next to IG_SESSION_FILEPATH."""
+    accounts = [Account(env.IG_USERNAME, env.IG_PASSWORD, env.IG_OTP, env.IG_SESSION_FILEPATH)]
+    for account in env.IG_ACCOUNTS:
+        username = account["username"]
+        session_filepath = Path(env.IG_SESSION_FILEPATH).with_name(f"session-{username}.json")
+        accounts.append(
+            Account(
+                username=username,
+                password=account["password"],
+                otp=account.get("otp"),
+                session_filepath=account.get("session_filepath") or str(session_filepath),
+            ),
+        )
+    return accounts
+
+
+class SessionStats(BaseModel):
+    username: str
+    valid: bool
+    session_age: float | None
+    checked_ago: float | None
+    in_use: int
+    uses: int
+    failures: int
+    last_used: float
+    quarantined_for: float
+
+
+class InstaloaderSession:
+    """
+    An Instagram account with its own logged-in Instaloader context.
+
+    ``instaloader`` is only replaced by a fully logged-in instance, so requests never see a half-logged-in one.
+    """
+
+    def __init__(self, account: Account, rate_controller: Callable[[InstaloaderContext], RateController] | None = None):
+        self.account = account
+        self.rate_controller = rate_controller
+        self.instaloader: Instaloader | None = None
+        self.valid = False
+        self.logged_in_at = 0.0
+        self.last_check = 0.0
+        self.last_used = 0.0
+        self.in_use = 0
+        self.uses = 0
+        self.failures = 0
+        self.quarantined_until = 0.0
+
+    @property
+    def username(self) -> str:
+        return self.account.username
+
+    @property
+    def quarantined(self) -> bool:
+        return time.time() < self.quarantined_until
+
+    def login(self) -> Instaloader | None:
+        """Log in a new Instaloader from the saved session, or from scratch if it is invalid."""
+        instaloader = Instaloader(max_connection_attempts=5, rate_controller=self.rate_controller)
+        logged_in = False
+        LOG.green(f"Logging in {self.username}")
+        session_file = Path(self.account.session_filepath)
+        if session_file.exists():
+            LOG.green(f"Using the saved session of {self.username}")
+            instaloader.load_session_from_file(self.username, str(session_file))
+            logged_in = instaloader.test_login()
+            if not logged_in:
+                LOG.red(f"Session of {self.username} is invalid. Removing the saved session")
+                shutil.move(str(session_file), str(session_file) + ".bak")
+
+        if not logged_in:
+            LOG.green(f"Logging in {self.username} from scratch")
+            try:
+                instaloader.login(self.username, self.account.password)
+            except TwoFactorAuthRequiredException:
+                totp = TOTP(self.account.otp)
+                otp = totp.now()
+                instaloader.two_factor_login(otp)
+
+            logged_in = instaloader.test_login()
+            if logged_in:
+                LOG.green(f"Logged in {self.username} successfully. Saving session")
+                instaloader.save_session_to_file(str(session_file))
+            else:
+                LOG.warning(f"Login of {self.username} from scratch failed")
+
+        return instaloader if logged_in else None
+
+    def stats(self) -> SessionStats:
+        now = time.time()
+        return SessionStats(
+            username=self.username,
+            valid=self.valid,
+            session_age=now - self.logged_in_at if self.logged_in_at else None,
+            checked_ago=now - self.last_check if self.last_check else None,
+            in_use=self.in_use,
+            uses=self.uses,
+            failures=self.failures,
+            last_used=self.last_used,
+            quarantined_for=max(0.0, self.quarantined_until - now),
+        )
+
+
+class SessionPool:
+    """
+    Logged-in Instaloader sessions of several accounts.
+
+    ``acquire`` hands out the healthiest valid session: the least busy, least failing and least recently used one.
+    Logins are validated by a background task once per ``login_check_interval``, never in a request,
+    which waits for the first validation with ``ready``. A session whose login fails, or that Instagram logs out,
+    is quarantined for ``quarantine`` seconds and logged in again afterwards.
+    """
+
+    def __init__(
+        self,
+        accounts: list[Account],
+        rate_controller: Callable[[InstaloaderContext], RateController] | None = None,
+        login_check_interval: int = 60 * 60,
+        quarantine: int = 30 * 60,
+    ):
+        assert accounts, "at least one account must be provided"
+        self.sessions = [InstaloaderSession(account, rate_controller) for account in accounts]
+        self.login_check_interval = login_check_interval
+        self.quarantine_duration = quarantine
+        self._lock = threading.Lock()
+        self._runner: asyncio.Task | None = None
+        self._validated = asyncio.Event()
+
+    async def ready(self, wait: float) -> bool:
+        """
+        Wait up to ``wait`` seconds for the first validation of the sessions, unless one is valid already.
+        Returns whether there was no need to wait any longer.
+        """
+        if not self._validated.is_set() and not any(_.valid for _ in self.sessions):
+            try:
+                await asyncio.wait_for(self._validated.wait(), wait)
+            except TimeoutError:
+                return False
+        return True
+
+    def retry_after(self) -> int:
+        """Seconds until a session may be valid again: the next validation after the shortest quarantine."""
+        now = time.time()
+        quarantines = [_.quarantined_until - now for _ in self.sessions if _.quarantined]
+        return int(min(quarantines, default=0)) + VALIDATION_TICK_SECONDS
+
+    def acquire(self) -> InstaloaderSession:
+        """Check out a logged-in session. Release it with ``release``."""
+        with self._lock:
+            candidates = [_ for _ in self.sessions if _.valid and not _.quarantined]
+            if not candidates:
+                msg = "No valid Instagram session available. Check the logs for the login errors"
+                raise NoSessionAvailableError(msg)
+
+            session = min(candidates, key=lambda _: (_.in_use, _.failures, _.last_used))
+            session.in_use += 1
+            session.uses += 1
+            session.last_used = time.time()
+            return session
+
+    def release(self, session: InstaloaderSession):
+        with self._lock:
+            session.in_use -= 1
+
+    def quarantine(self, session: InstaloaderSession):
+        LOG.red(f"Quarantining the session of {session.username} for {self.quarantine_duration}s")
+        with self._lock:
+            session.failures += 1
+            session.valid = False
+            session.quarantined_until = time.time() + self.quarantine_duration
+
+    def validate(self, session: InstaloaderSession):
+        """Test the login of the session, and swap in a freshly logged-in Instaloader if it is invalid."""
+        if session.valid and session.instaloader is not None:
+            try:
+                logged_in = session.instaloader.test_login()
+            except Exception as e:  # noqa: BLE001
+                LOG.error(f"{type(e)} while testing the login of {session.username}: {e}")  # noqa: TRY400
+                logged_in = False
+            if logged_in:
+                session.last_check = time.time()
+                return
+
+        try:
+            instaloader = session.login()
+        except Exception:
+            LOG.exception(f"Error logging in {session.username}. Check password")
+            instaloader = None
+        session.last_check = time.time()
+        if instaloader is None:
+            self.quarantine(session)
+            return
+
+        with self._lock:
+            session.instaloader = instaloader
+            session.logged_in_at = session.last_check
+            session.quarantined_until = 0.0
+            session.valid = True
+
+    def validate_due(self):
+        """Validate the sessions not checked within login_check_interval, and those out of quarantine."""
+        now = time.time()
+        for session in self.sessions:
+            if session.quarantined:
+                continue
+            if not session.valid or now - session.last_check > self.login_check_interval:
+                self.validate(session)
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.to_thread(self.validate_due)
+            except Exception:
+                LOG.exception("Error validating the Instagram sessions")
+            self._validated.set()
+            await asyncio.sleep(VALIDATION_TICK_SECONDS)
+
+    def start(self):
+        if self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is not None:
+            self._runner.cancel()
+            await asyncio.gather(self._runner, return_exceptions=True)
+            self._runner = None
+
+    def stats(self) -> list[SessionStats]:
+        return [_.stats() for _ in self.sessions]
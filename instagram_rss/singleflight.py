@@ -0,0 +1,76 @@
+from __future__ import annotations
+import asyncio
+from contextlib import asynccontextmanager
+from typing import TYPE_CHECKING, TypeVar
+from global_logger import Log
+from redis.asyncio import Redis
+from redis.exceptions import LockError, RedisError
+
+if TYPE_CHECKING:
+    from collections.abc import AsyncIterator, Awaitable, Callable
+
+LOG = Log.get_logger()
+T = TypeVar("T")
+
+
+class SingleFlight:
+    """
+    Coalesces concurrent builds of the same key into a single in-flight build.
+
+    In-process callers share one asyncio task. When a Redis URL is given, ``lock`` additionally
+    serializes the build across replicas, so only one of them scrapes Instagram for a cold key.
+    """
+
+    def __init__(self, redis_url: str | None = None, lock_timeout: int = 120):
+        self._inflight: dict[str, asyncio.Task] = {}
+        self._redis = Redis.from_url(redis_url) if redis_url else None
+        self.lock_timeout = lock_timeout
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[T]]) -> T:
+        """Await ``fn()``, or the already running call for the same key."""
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(fn())
+            self._inflight[key] = task
+            task.add_done_callback(lambda _: self._forget(key, task))
+        else:
+            self.coalesced += 1
+            LOG.debug(f"Joining the in-flight build for {key}")
+        # shield: a client disconnecting must not cancel the build the other waiters rely on
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+
+    @asynccontextmanager
+    async def lock(self, key: str) -> AsyncIterator[bool]:
+        """
+        Hold the cross-replica lock for ``key``. Yields True if another replica held it meanwhile,
+        in which case the caller should re-check the cache before building.
+        A no-op without Redis; Redis errors degrade to building without the lock.
+        """
+        if self._redis is None:
+            yield False
+            return
+
+        lock = self._redis.lock(f"lock:{key}", timeout=self.lock_timeout, blocking_timeout=self.lock_timeout)
+        acquired = waited = False
+        try:
+            acquired = await lock.acquire(blocking=False)
+            if not acquired:
+                waited = True
+                LOG.debug(f"Waiting for another replica to build {key}")
+                acquired = await lock.acquire()
+        except RedisError as e:
+            LOG.error(f"{type(e)} while acquiring the lock for {key}")  # noqa: TRY400
+
+        try:
+            yield waited
+        finally:
+            if acquired:
+                try:
+                    await lock.release()
+                except (LockError, RedisError) as e:
+                    LOG.warning(f"{type(e)} while releasing the lock for {key}")
@@ -0,0 +1,91 @@
+from __future__ import annotations
+import json
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from global_logger import Log
+
+LOG = Log.get_logger()
+PROFILE_NOT_EXISTS = ""
+INDEX_LENGTH_MAX = 50
+
+
+@dataclass
+class SectionIndex:
+    """The shortcodes of a profile section as of its previous build, in profile order, and the newest post date."""
+
+    shortcodes: list[str]
+    newest: float | None = None
+
+
+class StateStore:
+    """
+    SQLite file on the /data volume for what outlives the caches and restarts.
+
+    Falls back to an in-memory database if the file cannot be opened.
+    """
+
+    def __init__(self, filepath: str, username_duration: int, username_not_found_duration: int):
+        self.username_duration = username_duration
+        self.username_not_found_duration = username_not_found_duration
+        self._lock = threading.Lock()
+        try:
+            Path(filepath).parent.mkdir(parents=True, exist_ok=True)
+            self._db = sqlite3.connect(filepath, check_same_thread=False)
+        except (OSError, sqlite3.Error) as e:
+            LOG.warning(f"{type(e)} while opening {filepath}: {e}. Keeping the state in memory")
+            self._db = sqlite3.connect(":memory:", check_same_thread=False)
+        with self._lock, self._db:
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS usernames (username TEXT PRIMARY KEY, user_id TEXT, updated_at REAL)",
+            )
+            self._db.execute(
+                "CREATE TABLE IF NOT EXISTS sections"
+                " (user_id TEXT, section TEXT, shortcodes TEXT, newest REAL, PRIMARY KEY (user_id, section))",
+            )
+
+    def get_user_id(self, username: str) -> str | None:
+        """
+        Return the user id of a username, PROFILE_NOT_EXISTS for a username known not to exist,
+        or None if the username is unknown or was resolved too long ago.
+        """
+        with self._lock:
+            row = self._db.execute(
+                "SELECT user_id, updated_at FROM usernames WHERE username = ?",
+                (username.lower(),),
+            ).fetchone()
+        if row is None:
+            return None
+
+        user_id, updated_at = row
+        duration = self.username_duration if user_id else self.username_not_found_duration
+        if time.time() - updated_at > duration:
+            return None
+        return user_id or PROFILE_NOT_EXISTS
+
+    def set_user_id(self, username: str, user_id: str | int | None):
+        """Remember the user id of a username, or with None that the username does not exist."""
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO usernames (username, user_id, updated_at) VALUES (?, ?, ?)",
+                (username.lower(), str(user_id) if user_id else None, time.time()),
+            )
+
+    def get_section(self, user_id: str | int, section: str) -> SectionIndex:
+        with self._lock:
+            row = self._db.execute(
+                "SELECT shortcodes, newest FROM sections WHERE user_id = ? AND section = ?",
+                (str(user_id), section),
+            ).fetchone()
+        if row is None:
+            return SectionIndex(shortcodes=[])
+        return SectionIndex(shortcodes=json.loads(row[0]), newest=row[1])
+
+    def set_section(self, user_id: str | int, section: str, index: SectionIndex):
+        with self._lock, self._db:
+            self._db.execute(
+                "INSERT OR REPLACE INTO sections (user_id, section, shortcodes, newest) VALUES (?, ?, ?, ?)",
+                (str(user_id), section, json.dumps(index.shortcodes[:INDEX_LENGTH_MAX]), index.newest),
+            )
@@ -0,0 +1,71 @@
+from __future__ import annotations
+import asyncio
+import time
+from typing import TYPE_CHECKING
+from global_logger import Log
+
+if TYPE_CHECKING:
+    from collections.abc import Awaitable, Callable
+
+LOG = Log.get_logger()
+
+
+class StoryPrefetcher:
+    """
+    Fetches the stories of the users whose feeds with stories were requested recently, ``batch_size`` users at a
+    time, every ``interval`` seconds, into the item cache, where the feed builds find them.
+
+    Every feed read with stories is recorded with ``touch``. Instagram returns the stories of up to 50 users per
+    request, so the stories of all the hot users cost a request per 50 users per interval, instead of one per feed.
+    """
+
+    def __init__(
+        self,
+        fetch: Callable[[list[int]], Awaitable[None]],
+        interval: int,
+        hot_window: int,
+        batch_size: int,
+    ):
+        self._fetch = fetch
+        self.interval = interval
+        self.hot_window = hot_window
+        self.batch_size = batch_size
+        self.users: dict[int, float] = {}  # user id, last access
+        self._runner: asyncio.Task | None = None
+
+    def touch(self, user_id: int | str):
+        self.users[int(user_id)] = time.time()
+
+    def hot_users(self) -> list[int]:
+        now = time.time()
+        for user_id, last_access in list(self.users.items()):
+            if now - last_access > self.hot_window:
+                del self.users[user_id]
+        return list(self.users)
+
+    async def prefetch(self):
+        user_ids = self.hot_users()
+        for i in range(0, len(user_ids), self.batch_size):
+            batch = user_ids[i : i + self.batch_size]
+            try:
+                await self._fetch(batch)
+            except Exception:
+                LOG.exception(f"Error prefetching the stories of {len(batch)} users")
+        if user_ids:
+            LOG.debug(f"Prefetched the stories of {len(user_ids)} users")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            await self.prefetch()
+
+    def start(self):
+        if self.interval > 0 and self._runner is None:
+            self._runner = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._runner is None:
+            return
+        self._runner.cancel()
+        await asyncio.gather(self._runner, return_exceptions=True)
+        self._runner = None
@@ -0,0 +1,145 @@
+from __future__ import annotations
+import time
+from typing import TYPE_CHECKING, Any
+from global_logger import Log
+from pydantic import BaseModel
+from instagram_rss import metrics
+
+if TYPE_CHECKING:
+    from aiocache.base import BaseCache
+
+LOG = Log.get_logger()
+
+
+class CircuitBreakerStats(BaseModel):
+    state: str
+    failures: int
+    opened: int
+    skipped: int
+
+
+class CircuitBreaker:
+    """
+    Opens after ``max_failures`` failures in a row, so that the calls are skipped for ``cooldown`` seconds.
+    Then lets the calls through again, and opens at the first failure until one succeeds.
+    """
+
+    def __init__(self, max_failures: int = 3, cooldown: float = 30):
+        self.max_failures = max_failures
+        self.cooldown = cooldown
+        self.failures = 0
+        self.opened = 0
+        self.skipped = 0
+        self._open_until = 0.0
+
+    @property
+    def state(self) -> str:
+        if self.failures < self.max_failures:
+            return "closed"
+        return "open" if time.monotonic() < self._open_until else "half-open"
+
+    def allow(self) -> bool:
+        if self.state == "open":
+            self.skipped += 1
+            return False
+        return True
+
+    def success(self):
+        self.failures = 0
+
+    def failure(self):
+        self.failures += 1
+        if self.failures >= self.max_failures and self.state != "open":
+            self.opened += 1
+            self._open_until = time.monotonic() + self.cooldown
+
+    def stats(self) -> CircuitBreakerStats:
+        return CircuitBreakerStats(state=self.state, failures=self.failures, opened=self.opened, skipped=self.skipped)
+
+
+class TieredCache:
+    """
+    Read-through cache of an in-process ``l1`` over a shared ``l2``, e.g. redis.
+
+    Reads try ``l1`` first, then ``l2``, whose hits are copied into ``l1`` for ``l1_ttl`` seconds, which bounds how
+    long a replica serves its own copy of an entry another replica replaced. Writes go to both tiers.
+    ``l2`` is skipped while ``breaker`` is open, and the writes it missed stay in ``l1`` for the full TTL of ``l1``,
+    so an outage of ``l2`` costs no more than its first few failures. Reads with ``skip_l1`` look ``l2`` up first,
+    e.g. to re-check whether another replica replaced an entry, and fall back to ``l1`` without it.
+    """
+
+    def __init__(self, l1: BaseCache, l2: BaseCache | None, breaker: CircuitBreaker, l1_ttl: float, name: str):
+        self.l1 = l1
+        self.l2 = l2
+        self.breaker = breaker
+        self.l1_ttl = l1_ttl
+        self.name = name
+
+    def _l2_allowed(self, operation: str) -> bool:
+        if self.l2 is None:
+            return False
+        if self.breaker.allow():
+            return True
+        metrics.CACHE_FALLBACKS.inc(self.name, operation)
+        return False
+
+    def _l2_failed(self, operation: str, e: Exception):
+        LOG.error(f"{type(e)} while accessing the {self.name} cache in redis: {e}")
+        metrics.CACHE_FALLBACKS.inc(self.name, operation)
+        self.breaker.failure()
+
+    async def get(self, key: str, *, skip_l1: bool = False) -> Any:
+        if not skip_l1:
+            value = await self.l1.get(key)
+            if value is not None:
+                return value
+        if not self._l2_allowed("get"):
+            return await self.l1.get(key) if skip_l1 else None
+
+        try:
+            value = await self.l2.get(key)
+        except Exception as e:  # noqa: BLE001
+            self._l2_failed("get", e)
+            return await self.l1.get(key) if skip_l1 else None
+        self.breaker.success()
+        if value is None:
+            return await self.l1.get(key) if skip_l1 else None
+        await self.l1.set(key, value, ttl=self.l1_ttl)
+        return value
+
+    async def multi_get(self, keys: list[str]) -> list[Any]:
+        values = await self.l1.multi_get(keys)
+        missing = [i for i, value in enumerate(values) if value is None]
+        if not missing or not self._l2_allowed("get"):
+            return values
+
+        try:
+            found = await self.l2.multi_get([keys[_] for _ in missing])
+        except Exception as e:  # noqa: BLE001
+            self._l2_failed("get", e)
+            return values
+        self.breaker.success()
+        pairs = []
+        for i, value in zip(missing, found, strict=True):
+            if value is not None:
+                values[i] = value
+                pairs.append((keys[i], value))
+        if pairs:
+            await self.l1.multi_set(pairs, ttl=self.l1_ttl)
+        return values
+
+    async def set(self, key: str, value: Any):
+        if self._l2_allowed("set"):
+            try:
+                await self.l2.set(key, value)
+            except Exception as e:  # noqa: BLE001
+                self._l2_failed("set", e)
+            else:
+                self.breaker.success()
+                await self.l1.set(key, value, ttl=self.l1_ttl)
+                return
+        await self.l1.set(key, value)  # the only copy, until it expires or l2 is back
+
+    async def clear(self):
+        """Empty ``l1``. ``l2`` is shared with the other replicas and left as it is."""
+        await self.l1.clear()
@@ -1,11 +1,18 @@
 from __future__ import annotations
+import json
+from email.utils import parsedate_to_datetime
+from pathlib import Path
+from typing import TYPE_CHECKING
 from zoneinfo import ZoneInfo
 from datetime import datetime
-from feedgen.entry import FeedEntry
-from feedgen.feed import FeedGenerator
-from instagram_rss import env
+from instagram_rss import env, serializer
+from instagram_rss.serializer import Entry, Feed
 from global_logger import Log
 
+if TYPE_CHECKING:
+    from collections.abc import Mapping
+    from instagram_rss.models import CachedFeed
+
 LOG = Log.get_logger()
 
 
@@ -18,29 +25,55 @@ def timestamp_to_date(timestamp: str | float | None = None, _format: str = "%Y-%
     return timestamp.strftime(_format)
 
 
+def accepted_encodings(accept_encoding: str) -> set[str]:
+    """Parse an Accept-Encoding header into the content codings with a non-zero quality. ``*`` means gzip too."""
+    accepted, refused = set(), set()
+    for coding in accept_encoding.split(","):
+        name, _, params = coding.partition(";")
+        name, params = name.strip().lower(), params.strip()
+        try:
+            quality = float(params.removeprefix("q=")) if params.startswith("q=") else 1.0
+        except ValueError:
+            continue
+        if name:
+            (accepted if quality > 0 else refused).add(name)
+    if "*" in accepted and "gzip" not in refused:
+        accepted.add("gzip")
+    return accepted
+
+
+def is_not_modified(headers: Mapping[str, str], feed: CachedFeed) -> bool:
+    """Evaluate If-None-Match, or If-Modified-Since without it, of the request headers against the feed."""
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        etags = {_.strip().removeprefix("W/").strip('"') for _ in if_none_match.split(",")}
+        return "*" in etags or feed.etag in etags
+
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since is None or feed.last_modified is None:
+        return False
+    try:
+        return int(feed.last_modified) <= parsedate_to_datetime(if_modified_since).timestamp()
+    except ValueError:
+        return False
+
+
 def generate_erroreus_rss_feed(error: str):
     LOG.info(f"Generating Erroreus RSS feed with error: {error}")
-    feed = FeedGenerator()
-    feed.id(timestamp_to_date())
-    feed.title(error)
-    feed.description(error)
-
-    entry = FeedEntry()
-    entry.id(feed.id())
-    entry.link(feed.link())
-    content = error
-    entry.title(content)
-    entry.content(content)
+    feed = Feed(id=timestamp_to_date(), title=error, description=error)
     post_date = datetime.now(tz=ZoneInfo(env.TZ))
-    entry.published(post_date)
-    entry.updated(post_date)
-
-    feed.entry([entry])
+    feed.entries.append(Entry(id=feed.id, title=error, content=error, content_type=None, published=post_date))
+    return serializer.atom(feed, env.FEED_SERIALIZER)
 
-    if env.DEBUG:
-        filename = "feed.atom"
-        feed.atom_file(filename, pretty=True)
-        import webbrowser
 
-        webbrowser.open(filename)
-    return feed.atom_str(pretty=env.DEBUG)
+def load_groups(filepath: str) -> dict[str, list[str]]:
+    """Read the named groups of user_ids and usernames, e.g. ``{"friends": ["123", "username"]}``."""
+    path = Path(filepath)
+    if not path.exists():
+        return {}
+    try:
+        groups = json.loads(path.read_text(encoding="utf-8"))
+    except ValueError as e:
+        LOG.error(f"Error reading the groups from {filepath}: {e}")  # noqa: TRY400
+        return {}
+    return {str(name): [str(_) for _ in users] for name, users in groups.items()}
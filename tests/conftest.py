@@ -0,0 +1,12 @@
+import os
+import tempfile
+
+# instagram_rss.env refuses to load without credentials, which the tests never use
+os.environ.setdefault("IG_USERNAME", "test")
+os.environ.setdefault("IG_PASSWORD", "test")
+# and importing the app would create its files on the /data volume
+DATA = tempfile.mkdtemp(prefix="instagram-rss-tests-")
+os.environ.setdefault("IG_SESSION_FILEPATH", os.path.join(DATA, "session.json"))  # noqa: PTH118
+os.environ.setdefault("STATE_DB_FILEPATH", os.path.join(DATA, "state.sqlite3"))  # noqa: PTH118
+os.environ.setdefault("MEDIA_CACHE_DIRPATH", os.path.join(DATA, "media"))  # noqa: PTH118
+os.environ.setdefault("MEDIA_PROXY_SECRET_FILEPATH", os.path.join(DATA, "media_secret"))  # noqa: PTH118
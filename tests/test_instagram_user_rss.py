@@ -0,0 +1,256 @@
+import asyncio
+import time
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+from instaloader import Post, Story, StoryItem
+from instagram_rss import env
+from instagram_rss.instagram_user_rss import InstagramUserRSS, extract_post, extract_story_item, fetch_stories
+from instagram_rss.models import MediaData, UserStories
+from instagram_rss.scraper import ScrapeExecutor
+from instagram_rss.state import StateStore
+
+DATE = datetime(2024, 1, 2, tzinfo=UTC)
+
+
+class DictItemCache:
+    def __init__(self):
+        self.posts = {}
+        self.story_items = {}
+        self.user_stories = {}
+
+    def get_post(self, shortcode):
+        return self.posts.get(shortcode)
+
+    def get_posts(self, shortcodes):
+        return [self.posts.get(_) for _ in shortcodes]
+
+    def set_post(self, post):
+        self.posts[post.shortcode] = post
+
+    def get_story_item(self, mediaid):
+        return self.story_items.get(mediaid)
+
+    def set_story_item(self, story_item):
+        self.story_items[story_item.mediaid] = story_item
+
+    def get_user_stories(self, user_id):
+        return self.user_stories.get(user_id)
+
+    def set_user_stories(self, user_id, stories):
+        self.user_stories[user_id] = stories
+
+
+def make_post(shortcode: str, days_ago: int) -> SimpleNamespace:
+    return SimpleNamespace(
+        shortcode=shortcode,
+        owner_username="user",
+        caption=shortcode,
+        date_local=DATE - timedelta(days=days_ago),
+        typename="GraphImage",
+        url=f"https://cdn.example/{shortcode}.jpg",
+        tagged_users=[],
+        _node={"display_url": f"https://cdn.example/{shortcode}.jpg"},
+    )
+
+
+def walk(rss: InstagramUserRSS, posts: list, limit: int) -> tuple[list[str], int]:
+    """Return the shortcodes taken and the number of posts the section iterator yielded."""
+    yielded = []
+
+    def iterate():
+        for post in posts:
+            yielded.append(post)
+            yield post
+
+    return [_.shortcode for _ in rss.get_section("posts", iterate(), limit)], len(yielded)
+
+
+def test_rebuild_stops_at_known_posts_below_pinned():
+    profile = SimpleNamespace(username="user", userid=1)
+    rss = InstagramUserRSS(profile, il=None, item_cache=DictItemCache(), state=StateStore(":memory:", 60, 60))
+    pinned, a, b, c = make_post("pinned", 100), make_post("a", 3), make_post("b", 4), make_post("c", 5)
+    assert walk(rss, [pinned, a, b, c], 3) == (["pinned", "a", "b"], 3)
+    assert rss.state.get_section(1, "posts").newest == a.date_local.timestamp()
+
+    assert walk(rss, [pinned, a, b, c], 3) == (["pinned", "a", "b"], 2)  # unchanged: stops at a
+
+    new = make_post("new", 1)
+    assert walk(rss, [pinned, new, a, b, c], 3) == (["pinned", "new", "a"], 3)
+    assert walk(rss, [pinned, new, a, b, c], 4) == (["pinned", "new", "a", "b"], 2)
+
+
+class OfflineContext:
+    """An InstaloaderContext that fails every request, logged in with iPhone support like the service's."""
+
+    iphone_support = True
+    is_logged_in = True
+
+    def __getattr__(self, name):
+        msg = f"{name} requested"
+        raise AssertionError(msg)
+
+
+def test_lean_extraction_reads_the_list_nodes():
+    context = OfflineContext()
+    node = {"shortcode": "img", "__typename": "GraphImage", "display_url": "https://cdn/img.jpg", "is_video": False}
+    node |= {"taken_at_timestamp": DATE.timestamp(), "owner": {"id": "1", "username": "user"}}
+    node |= {"edge_media_to_caption": {"edges": []}, "edge_media_to_tagged_user": {"edges": []}}
+    video = node | {
+        "shortcode": "vid",
+        "__typename": "GraphVideo",
+        "video_url": "https://cdn/vid.mp4",
+        "is_video": True,
+    }
+    children = [{"node": {"is_video": False, "display_url": f"https://cdn/{_}.jpg"}} for _ in range(2)]
+    sidecar = node | {
+        "shortcode": "side",
+        "__typename": "GraphSidecar",
+        "edge_sidecar_to_children": {"edges": children},
+    }
+
+    assert extract_post(Post(context, node), lean=True).media == [MediaData("https://cdn/img.jpg", is_video=False)]
+    assert extract_post(Post(context, video), lean=True).media == [MediaData("https://cdn/vid.mp4", is_video=True)]
+    assert [_.url for _ in extract_post(Post(context, sidecar), lean=True).media] == [
+        "https://cdn/0.jpg",
+        "https://cdn/1.jpg",
+    ]
+
+    iphone_struct = {"code": "iph", "pk": "9", "media_type": 1, "taken_at": DATE.timestamp(), "caption": None}
+    iphone_struct |= {
+        "has_liked": False,
+        "like_count": 0,
+        "image_versions2": {"candidates": [{"url": "https://cdn/i.jpg"}]},
+    }
+    iphone_struct["user"] = {"pk": "1", "username": "user", "is_private": False, "full_name": "", "profile_pic_url": ""}
+    iphone_struct["usertags"] = {"in": [{"user": {"username": "Friend"}}]}
+    post = extract_post(Post.from_iphone_struct(context, iphone_struct), lean=True)
+    assert (post.owner_username, post.tagged_users) == ("user", ["friend"])
+    assert post.media == [MediaData("https://cdn/i.jpg", is_video=False)]
+
+    story = {"id": "5", "__typename": "GraphStoryImage", "is_video": False, "taken_at_timestamp": DATE.timestamp()}
+    story["display_resources"] = [{"src": "https://cdn/small.jpg"}, {"src": "https://cdn/story.jpg"}]
+    assert extract_story_item(StoryItem(context, story), "user", lean=True).url == "https://cdn/story.jpg"
+
+
+class StoriesInstaloader:
+    """Has stories for the users 1 and 2, and records the user ids of every stories query."""
+
+    def __init__(self):
+        self.queries = []
+
+    def get_stories(self, userids):
+        self.queries.append(userids)
+        for userid in userids:
+            if userid in {1, 2}:
+                item = {"id": str(userid * 10), "__typename": "GraphStoryImage", "is_video": False}
+                item |= {
+                    "taken_at_timestamp": DATE.timestamp(),
+                    "display_resources": [{"src": f"https://cdn/{userid}"}],
+                }
+                user = {"id": str(userid), "username": f"user{userid}"}
+                yield Story(OfflineContext(), {"user": user, "items": [item]})  # no iPhone API lookup in lean mode
+
+
+def test_stories_are_fetched_in_batches_and_read_by_the_builds():
+    il, item_cache = StoriesInstaloader(), DictItemCache()
+    fetched = fetch_stories(il, [1, 2, 3], item_cache)
+    assert il.queries == [[1, 2, 3]]
+    assert [_.mediaid for _ in fetched[2].items] == [20]
+    assert fetched[3].items == []
+
+    rss = InstagramUserRSS(SimpleNamespace(username="user3", userid=3), il=il, item_cache=item_cache)
+    assert rss.get_stories() == []
+    rss = InstagramUserRSS(SimpleNamespace(username="user2", userid=2), il=il, item_cache=item_cache)
+    assert [_.mediaid for _ in rss.get_stories()] == [20]
+    assert len(il.queries) == 1
+
+    item_cache.user_stories[2] = UserStories(items=[], fetched_at=0)  # too old, fetched again
+    assert [_.mediaid for _ in rss.get_stories()] == [20]
+    assert il.queries[-1] == [2]
+
+
+class SectionsRSS(InstagramUserRSS):
+    """
+    Fetches every section in ``seconds``, the ``slow`` one in four times that, and fails the ``failing`` one.
+    Renders the feed as the sections it got, in their order.
+    """
+
+    def __init__(self, seconds: float, failing: str | None = None, slow: str | None = None):
+        super().__init__(SimpleNamespace(username="user", userid=1), il=None)
+        self.seconds = seconds
+        self.failing = failing
+        self.slow = slow
+
+    def _fetch_section(self, section, limit):  # noqa: ARG002
+        time.sleep(self.seconds * 4 if section == self.slow else self.seconds)
+        if section == self.failing:
+            raise ConnectionError
+        return [section]
+
+    def generate_rss_feed(self, **sections):
+        return [section for section, result in sections.items() if result is not None]
+
+
+def test_section_timeout_starts_on_a_worker():
+    async def run():
+        scraper = ScrapeExecutor(max_workers=1)
+        rss = SectionsRSS(0.3)
+        feed = await rss.get_rss_async(scraper.run, concurrency=3, section_timeout=0.5, posts=True, reels=True)
+        scraper.shutdown()
+        return feed, rss.missing_sections
+
+    # the sections queue up behind each other on the worker for longer than their timeout, but each takes less
+    assert asyncio.run(run()) == (["posts", "reels", "stories"], [])
+
+
+def test_sections_are_fetched_concurrently_up_to_the_cap():
+    running, peak = 0, 0
+
+    async def run(fn, *args, **kwargs):
+        nonlocal running, peak
+        running += 1
+        peak = max(peak, running)
+        try:
+            return await asyncio.to_thread(fn, *args, **kwargs)
+        finally:
+            running -= 1
+
+    async def build(rss, concurrency, section_timeout):
+        return await rss.get_rss_async(run, concurrency=concurrency, section_timeout=section_timeout, tagged=True)
+
+    assert asyncio.run(build(SectionsRSS(0.05), 2, 1)) == ["posts", "reels", "stories", "tagged"]
+    assert peak == 2  # noqa: PLR2004
+
+    peak = 0
+    rss = SectionsRSS(0.05, failing="reels")
+    assert asyncio.run(build(rss, 4, 1)) == ["posts", "stories", "tagged"]  # in the order of the sections
+    assert rss.missing_sections == ["reels"]
+    assert peak == 4  # noqa: PLR2004
+
+    rss = SectionsRSS(0.05, slow="stories")
+    assert asyncio.run(build(rss, 4, 0.1)) == ["posts", "reels", "tagged"]
+    assert rss.missing_sections == ["stories"]
+
+
+def test_feeds_without_posts_keep_their_content_between_builds(monkeypatch):
+    profile = SimpleNamespace(
+        username="user",
+        userid=1,
+        full_name="User",
+        biography=None,
+        profile_pic_url_no_iphone=None,
+        is_private=True,
+        followed_by_viewer=False,
+    )
+    rss = InstagramUserRSS(profile, il=None)
+    for serializer in ("fast", "feedgen"):
+        monkeypatch.setattr(env, "FEED_SERIALIZER", serializer)
+        private = rss.generate_rss_feed()
+        time.sleep(0.01)
+        assert rss.generate_rss_feed() == private
+
+        profile.is_private = False
+        empty = rss.generate_rss_feed(posts=[], reels=[], stories=[])
+        time.sleep(0.01)
+        assert rss.generate_rss_feed(posts=[], reels=[], stories=[]) == empty
+        profile.is_private = True
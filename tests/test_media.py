@@ -0,0 +1,32 @@
+from instagram_rss.media import MediaProxy, load_secret
+
+URL = "https://scontent.cdninstagram.com/v/t51/123_n.jpg?stp=dst-jpg&_nc_ht=scontent&oh=00&oe=FF"
+
+
+def test_url_round_trip(tmp_path):
+    proxy = MediaProxy("https://rss.example/", secret="secret", dirpath=str(tmp_path), max_bytes=1024)  # noqa: S106
+    proxied = proxy.url(URL)
+    assert proxied.startswith("https://rss.example/media/")
+    assert proxied.endswith(".jpg")
+    signature, name = proxied.split("/")[-2:]
+    assert proxy.verify(signature, name) == URL
+
+    other = MediaProxy("https://rss.example/", secret="other", dirpath=str(tmp_path), max_bytes=1024)  # noqa: S106
+    assert other.verify(signature, name) is None
+    assert proxy.verify(signature, "aHR0cHM6Ly9leGFtcGxlLmNvbS8.jpg") is None
+    assert proxy.verify("\u00e9", name) is None
+    assert proxy.url("https://example.com/a.jpg") == "https://example.com/a.jpg"
+    assert proxy.url(None) is None
+
+
+def test_filename_ignores_the_cdn_signature():
+    assert MediaProxy.filename(URL) == MediaProxy.filename(URL.replace("oe=FF", "oe=00"))
+    assert MediaProxy.filename(URL).endswith(".jpg")
+
+
+def test_load_secret_is_random_and_kept(tmp_path):
+    filepath = str(tmp_path / "data" / "media_secret")
+    secret = load_secret(filepath)
+    assert len(secret) >= 32  # noqa: PLR2004
+    assert load_secret(filepath) == secret
+    assert load_secret(str(tmp_path / "other")) != secret
@@ -0,0 +1,74 @@
+import asyncio
+from unittest import mock
+from instagram_rss.memory_cache import BoundedMemoryCache, sizeof
+
+VALUE = "x" * 100
+SIZE = sizeof(VALUE)
+
+
+def test_evicts_the_least_recently_used_entries():
+    async def run():
+        cache = BoundedMemoryCache(max_entries=3, max_bytes=SIZE * 10)
+        for key in "abc":
+            await cache.set(key, VALUE)
+        assert await cache.get("a") == VALUE  # "b" is the least recently used now
+        await cache.set("d", VALUE)
+        assert await cache.multi_get(["a", "b", "c", "d"]) == [VALUE, None, VALUE, VALUE]
+        assert (cache.stats().entries, cache.evictions) == (3, 1)
+
+    asyncio.run(run())
+
+
+def test_keeps_within_the_byte_budget():
+    async def run():
+        cache = BoundedMemoryCache(max_entries=10, max_bytes=SIZE * 2)
+        for key in "abc":
+            await cache.set(key, VALUE)
+        assert await cache.multi_get(["a", "b", "c"]) == [None, VALUE, VALUE]
+        assert cache.stats().bytes == SIZE * 2
+
+        await cache.set("b", "y")  # replacing an entry frees its bytes
+        assert cache.stats().bytes == SIZE + sizeof("y")
+        await cache.delete("c")
+        assert cache.stats().bytes == sizeof("y")
+
+    asyncio.run(run())
+
+
+def test_does_not_store_entries_larger_than_the_budget():
+    async def run():
+        cache = BoundedMemoryCache(max_entries=10, max_bytes=SIZE * 2)
+        await cache.set("a", VALUE)
+        await cache.set("huge", VALUE * 3)
+        assert await cache.get("huge") is None
+        assert await cache.get("a") == VALUE  # the others stay
+        await cache.set("a", VALUE * 3)
+        assert await cache.get("a") is None  # and an oversize update drops the old value
+        assert cache.stats().bytes == 0
+
+    asyncio.run(run())
+
+
+def test_expires_entries():
+    async def run():
+        cache = BoundedMemoryCache(max_entries=2, max_bytes=SIZE * 10)
+        with mock.patch("instagram_rss.memory_cache.time.monotonic", return_value=100.0):
+            await cache.set("a", VALUE, ttl=10)
+            await cache.set("b", VALUE)
+        with mock.patch("instagram_rss.memory_cache.time.monotonic", return_value=110.0):
+            assert not await cache.exists("a")
+            assert await cache.get("a") is None
+            assert await cache.get("b") == VALUE  # no ttl
+            assert cache.expirations == 1
+
+            await cache.set("c", VALUE, ttl=3)
+            await cache.set("d", VALUE)
+            assert cache.evictions == 1  # "b", the least recently used
+            await cache.expire("d", 5)
+        with mock.patch("instagram_rss.memory_cache.time.monotonic", return_value=115.0):
+            await cache.set("e", VALUE)  # evicting "c", which has expired meanwhile
+            assert (cache.evictions, cache.expirations) == (1, 2)
+            assert await cache.get("d") is None  # expired by expire
+            assert cache.expirations == 3  # noqa: PLR2004
+
+    asyncio.run(run())
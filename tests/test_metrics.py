@@ -0,0 +1,22 @@
+import asyncio
+from instagram_rss import metrics
+
+
+def test_new_traces_count_their_own_requests_and_add_up_into_the_parent():
+    async def build(requests: int) -> int:
+        with metrics.trace(new=True) as trace:
+            for _ in range(requests):
+                await asyncio.sleep(0)
+                metrics.upstream_request("test")
+            metrics.observe_stage("build", 1.0)
+        return trace.upstream
+
+    async def run():
+        with metrics.trace() as parent:
+            assert await asyncio.gather(build(2), build(3)) == [2, 3]  # not the requests of the other build
+            with metrics.trace() as same:
+                assert same is parent
+        assert parent.upstream == 5  # noqa: PLR2004
+        assert parent.stages == {"build": 2.0}
+
+    asyncio.run(run())
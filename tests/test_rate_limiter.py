@@ -0,0 +1,64 @@
+from unittest import mock
+import pytest
+from instagram_rss.rate_limiter import BACKOFF_DECAY_AFTER, BACKOFF_MAX, BACKOFF_MIN, TokenBucket
+
+
+class Clock:
+    """Stands in for the time module of the rate limiter: sleeping moves the clock."""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+    def sleep(self, seconds: float):
+        self.now += seconds
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with mock.patch("instagram_rss.rate_limiter.time", clock):
+        yield clock
+
+
+def test_bursts_then_refills_at_the_rate(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=3)
+    assert [bucket.acquire() for _ in range(3)] == [0.0] * 3
+    assert bucket.acquire() == pytest.approx(1.0)  # one token per second
+    assert (bucket.throttled, bucket.throttled_seconds) == (1, pytest.approx(1.0))
+
+    clock.sleep(10)
+    assert bucket.tokens == 3  # never more than the burst  # noqa: PLR2004
+    assert bucket.acquire() == 0.0
+
+
+def test_backs_off_on_429_and_decays(clock):
+    bucket = TokenBucket(rate_per_minute=60, burst=3)
+    bucket.too_many()
+    assert bucket.backoff == BACKOFF_MIN
+    assert bucket.acquire() == pytest.approx(BACKOFF_MIN)  # every request waits for the pause
+
+    bucket.too_many()
+    assert bucket.backoff == BACKOFF_MIN * 2
+    for _ in range(10):
+        bucket.too_many()
+    assert bucket.backoff == BACKOFF_MAX
+    assert bucket.too_many_requests == 12  # noqa: PLR2004
+
+    clock.sleep(BACKOFF_MAX * BACKOFF_DECAY_AFTER + 1)
+    bucket.acquire()
+    assert bucket.backoff == BACKOFF_MAX / 2
+    bucket.acquire()
+    assert bucket.backoff == BACKOFF_MAX / 2  # decays once per quiet period
+
+    backoff = bucket.backoff
+    while backoff / 2 >= BACKOFF_MIN:
+        clock.sleep(backoff * BACKOFF_DECAY_AFTER + 1)
+        bucket.acquire()
+        backoff /= 2
+        assert bucket.backoff == backoff
+    clock.sleep(backoff * BACKOFF_DECAY_AFTER + 1)
+    bucket.acquire()
+    assert bucket.backoff == 0.0
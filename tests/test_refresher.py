@@ -0,0 +1,47 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from instagram_rss.refresher import FeedRefresher
+
+
+def make_refresher(builds: list, budget_per_minute: int = 2, *, fail: bool = False) -> FeedRefresher:
+    async def build(key, _feed):
+        builds.append(key)
+        if fail:
+            raise ConnectionError
+        return SimpleNamespace(built_at=time.time())
+
+    async def get(_key):
+        return None
+
+    return FeedRefresher(build=build, get=get, ttl=600, hot_window=3600, budget_per_minute=budget_per_minute)
+
+
+def test_revalidate_draws_from_the_budget():
+    async def run():
+        builds = []
+        refresher = make_refresher(builds)
+        stale = time.time() - 700
+        for key in ("a", "b", "c"):
+            refresher.touch(key, key, {}, stale)
+            refresher.revalidate(key)
+            refresher.revalidate(key)  # being rebuilt already
+        await asyncio.gather(*refresher._tasks)  # noqa: SLF001
+        assert builds == ["a", "b"]  # "c" is served stale until the budget resets
+
+    asyncio.run(run())
+
+
+def test_revalidate_backs_off_after_a_failure():
+    async def run():
+        builds = []
+        refresher = make_refresher(builds, budget_per_minute=10, fail=True)
+        refresher.touch("a", "a", {}, time.time() - 700)
+        refresher.revalidate("a")
+        await asyncio.gather(*refresher._tasks)  # noqa: SLF001
+        assert refresher.feeds["a"].refresh_at > time.time()
+        refresher.revalidate("a")
+        assert not refresher._tasks  # noqa: SLF001
+        assert builds == ["a"]
+
+    asyncio.run(run())
@@ -0,0 +1,148 @@
+import xml.etree.ElementTree as ET
+from datetime import UTC, datetime, timedelta
+from types import SimpleNamespace
+import pytest
+from instagram_rss import env, serializer, tools
+from instagram_rss.instagram_user_rss import InstagramUserRSS
+from instagram_rss.models import MediaData, PostData, StoryItemData
+from instagram_rss.serializer import Entry, Feed
+
+ATOM = "{http://www.w3.org/2005/Atom}"
+DATE = datetime(2024, 1, 2, 3, 4, 5, tzinfo=UTC)
+CAPTION = "Tom & Jerry <3 \"quotes\" 'apostrophes'\r\n\ttabs and emoji 🐈 > end"
+
+
+def canonical(content: bytes) -> str:
+    """Canonicalize an Atom document without the generator element, which only feedgen writes."""
+    root = ET.fromstring(content)  # noqa: S314
+    for generator in root.findall(f"{ATOM}generator"):
+        root.remove(generator)
+    return ET.canonicalize(ET.tostring(root))
+
+
+def make_feed(entries: int) -> Feed:
+    return Feed(
+        id="https://www.instagram.com/user",
+        title="user",
+        description=CAPTION,
+        link="https://www.instagram.com/user",
+        image="https://cdn.example/pic.jpg?a=1&b=2",
+        updated=DATE,
+        entries=[
+            Entry(
+                id=f"https://www.instagram.com/p/{i}/",
+                link=f'https://www.instagram.com/p/{i}/?a=1&b="2"',
+                author="user",
+                title=f"user post: {CAPTION}",
+                content=f'<a href="https://www.instagram.com/user">@user</a><br>{CAPTION}<br><img src="x?a=1&b=2"/>',
+                published=DATE - timedelta(hours=i),
+                source_url=f"https://www.instagram.com/p/{i}/",
+                source_title=CAPTION,
+            )
+            for i in range(entries)
+        ],
+    )
+
+
+@pytest.mark.parametrize("entries", [0, 1, 50])
+def test_atom_equals_feedgen(entries):
+    feed = make_feed(entries)
+    assert canonical(b"".join(_.encode() for _ in serializer.iter_atom(feed))) == canonical(
+        serializer.feedgen_atom(feed),
+    )
+
+
+def test_atom_equals_feedgen_without_optional_fields():
+    feed = Feed(id="2024-01-02_03-04-05", title="error", description="error", updated=DATE)
+    feed.entries.append(Entry(id=feed.id, title="error", content="error & <more>", content_type=None, published=DATE))
+    assert canonical(serializer.atom(feed, "fast")) == canonical(serializer.atom(feed, "feedgen"))
+
+
+def test_atom_drops_xml_invalid_characters():
+    feed = make_feed(1)
+    feed.entries[0].content = "before\x00\x08\x1fafter"
+    with pytest.raises(ValueError, match="XML compatible"):
+        serializer.feedgen_atom(feed)
+    root = ET.fromstring(serializer.atom(feed, "fast"))  # noqa: S314
+    assert root.find(f"{ATOM}entry/{ATOM}content").text == "beforeafter"
+
+
+@pytest.mark.parametrize("name", ["fast", "feedgen"])
+def test_user_feed(monkeypatch, name):
+    monkeypatch.setattr(env, "FEED_SERIALIZER", name)
+    profile = SimpleNamespace(
+        username="user",
+        userid=1,
+        biography=CAPTION,
+        profile_pic_url_no_iphone="https://cdn.example/pic.jpg?a=1&b=2",
+        is_private=False,
+    )
+    posts = [
+        PostData(
+            shortcode="abc",
+            owner_username="user",
+            caption=CAPTION,
+            date=DATE,
+            typename="GraphSidecar",
+            media=[MediaData(url="https://cdn.example/1.jpg?a&b", is_video=False), MediaData("v.mp4", is_video=True)],
+            tagged_users=["friend"],
+        ),
+    ]
+    stories = [StoryItemData(mediaid=2, owner_username="user", date=DATE + timedelta(1), is_video=False, url="s.jpg")]
+    content = InstagramUserRSS(profile, il=None).generate_rss_feed(posts=posts, stories=stories)
+
+    monkeypatch.setattr(env, "FEED_SERIALIZER", "feedgen" if name == "fast" else "fast")
+    other = InstagramUserRSS(profile, il=None).generate_rss_feed(posts=posts, stories=stories)
+    assert canonical(content) == canonical(other)
+    assert [_.text for _ in ET.fromstring(content).iter(f"{ATOM}id")][1:] == [  # noqa: S314
+        "https://www.instagram.com/p/abc/",
+        "https://www.instagram.com/stories/user/2/",
+    ]
+
+
+def test_error_feed(monkeypatch):
+    monkeypatch.setattr(env, "FEED_SERIALIZER", "fast")
+    root = ET.fromstring(tools.generate_erroreus_rss_feed("<class 'Exception'>: & failed"))  # noqa: S314
+    assert root.find(f"{ATOM}title").text == "<class 'Exception'>: & failed"
+
+
+@pytest.mark.parametrize("name", ["fast", "feedgen"])
+def test_merge_atom_takes_shared_posts_once(name):
+    own = make_feed(3)
+    tagger = make_feed(2)
+    tagger.title = "tagger"
+    tagger.entries[0].id = "https://www.instagram.com/p/9/"
+    for entry in tagger.entries:
+        entry.title = f"tagger tagged post by @user: {CAPTION}"
+
+    merged = serializer.Feed(id="batch", title="batch", description="user, tagger")
+    contents = [serializer.atom(_, name).decode() for _ in (tagger, own)]
+    root = ET.fromstring(serializer.merge_atom(merged, contents))  # noqa: S314
+    entries = root.findall(f"{ATOM}entry")
+    ids = [_.find(f"{ATOM}id").text for _ in entries]
+    assert sorted(ids) == sorted({_.id for _ in [*own.entries, *tagger.entries]})
+    assert [_.find(f"{ATOM}published").text for _ in entries] == sorted(
+        _.find(f"{ATOM}published").text for _ in entries
+    )
+    shared = entries[ids.index("https://www.instagram.com/p/1/")]
+    assert shared.find(f"{ATOM}title").text.startswith("user post")
+    assert merged.updated == DATE
+
+
+def test_opml():
+    outlines = [
+        serializer.Outline(text="user", xml_url="http://host/instagram/user?a=1&b=2", html_url="https://i/user"),
+        serializer.Outline(text="123", xml_url="http://host/instagram/123"),
+    ]
+    root = ET.fromstring(serializer.opml("friends & co", outlines))  # noqa: S314
+    assert root.find("head/title").text == "friends & co"
+    assert [_.attrib for _ in root.iter("outline")] == [
+        {
+            "type": "rss",
+            "text": "user",
+            "title": "user",
+            "xmlUrl": "http://host/instagram/user?a=1&b=2",
+            "htmlUrl": "https://i/user",
+        },
+        {"type": "rss", "text": "123", "title": "123", "xmlUrl": "http://host/instagram/123"},
+    ]
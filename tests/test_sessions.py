@@ -0,0 +1,107 @@
+import asyncio
+import time
+from types import SimpleNamespace
+from unittest import mock
+import pytest
+from instagram_rss.exceptions import NoSessionAvailableError
+from instagram_rss.sessions import Account, InstaloaderSession, SessionPool
+
+
+def fake_instaloader(*, logged_in: bool = True) -> SimpleNamespace:
+    return SimpleNamespace(test_login=lambda: "user" if logged_in else None)
+
+
+def make_pool(*usernames: str) -> SessionPool:
+    pool = SessionPool([Account(_, "password") for _ in usernames], login_check_interval=3600, quarantine=1800)
+    for session in pool.sessions:
+        session.instaloader = fake_instaloader()
+        session.valid = True
+    return pool
+
+
+def test_acquire_picks_the_least_busy_then_least_failing_then_least_recently_used():
+    pool = make_pool("a", "b", "c")
+    a, b, c = pool.sessions
+    with mock.patch("time.time", return_value=1000.0):
+        assert pool.acquire() is a
+    with mock.patch("time.time", return_value=1001.0):
+        assert pool.acquire() is b  # a is busy
+    with mock.patch("time.time", return_value=1002.0):
+        assert pool.acquire() is c
+    pool.release(a)
+    pool.release(b)
+    assert pool.acquire() is a  # used before b
+    pool.release(a)
+
+    a.failures = 1
+    assert pool.acquire() is b
+    assert (a.uses, b.uses, c.uses) == (2, 2, 1)
+
+
+def test_acquire_fails_without_a_valid_session():
+    pool = make_pool("a", "b")
+    a, b = pool.sessions
+    a.valid = False
+    pool.quarantine(b)
+    with pytest.raises(NoSessionAvailableError):
+        pool.acquire()
+    assert pool.retry_after() >= pool.quarantine_duration
+
+
+def test_failed_logins_are_quarantined_and_logged_in_again():
+    pool = make_pool("a")
+    (session,) = pool.sessions
+    old = session.instaloader = fake_instaloader(logged_in=False)  # logged out by Instagram
+    with mock.patch.object(InstaloaderSession, "login", return_value=None) as login:
+        pool.validate_due()
+        pool.validate_due()  # quarantined: not logged in again meanwhile
+    assert login.call_count == 1
+    assert session.instaloader is old  # only swapped for a logged-in one
+    assert (session.valid, session.quarantined, session.failures) == (False, True, 1)
+
+    new = fake_instaloader()
+    with (
+        mock.patch.object(InstaloaderSession, "login", return_value=new) as login,
+        mock.patch("time.time", return_value=time.time() + pool.quarantine_duration),
+    ):
+        pool.validate_due()
+    assert login.call_count == 1
+    assert session.instaloader is new
+    assert (session.valid, session.quarantined) == (True, False)
+
+
+def test_a_login_error_keeps_the_previous_instance():
+    pool = make_pool("a")
+    (session,) = pool.sessions
+    session.valid = False
+    old = session.instaloader
+    with mock.patch.object(InstaloaderSession, "login", side_effect=ConnectionError):
+        pool.validate(session)
+    assert session.instaloader is old
+    assert session.quarantined
+
+
+def test_valid_sessions_are_only_checked_once_per_interval():
+    pool = make_pool("a")
+    (session,) = pool.sessions
+    test_login = mock.Mock(return_value="user")
+    session.instaloader = SimpleNamespace(test_login=test_login)
+    session.last_check = time.time()
+    pool.validate_due()
+    assert test_login.call_count == 0
+    with mock.patch("time.time", return_value=time.time() + pool.login_check_interval + 1):
+        pool.validate_due()
+    assert test_login.call_count == 1
+
+
+def test_requests_wait_for_the_first_validation():
+    async def run():
+        pool = SessionPool([Account("a", "password")])
+        assert not await pool.ready(0.01)
+        with mock.patch.object(InstaloaderSession, "login", return_value=fake_instaloader()):
+            pool.start()
+            assert await pool.ready(1)
+            await pool.stop()
+        assert pool.acquire() is pool.sessions[0]
+
+    asyncio.run(run())
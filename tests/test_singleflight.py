@@ -0,0 +1,65 @@
+import asyncio
+import pytest
+from instagram_rss.singleflight import SingleFlight
+
+
+def test_concurrent_calls_share_one_build():
+    async def run():
+        singleflight = SingleFlight()
+        builds = []
+
+        async def build():
+            builds.append(1)
+            await asyncio.sleep(0.01)
+            return len(builds)
+
+        assert await asyncio.gather(*(singleflight.do("key", build) for _ in range(5))) == [1] * 5
+        assert singleflight.coalesced == 4  # noqa: PLR2004
+        assert await singleflight.do("key", build) == 2  # a later call builds again  # noqa: PLR2004
+        assert await singleflight.do("other", build) == 3  # noqa: PLR2004
+
+    asyncio.run(run())
+
+
+def test_a_cancelled_waiter_does_not_cancel_the_build():
+    async def run():
+        singleflight = SingleFlight()
+        started = asyncio.Event()
+
+        async def build():
+            started.set()
+            await asyncio.sleep(0.01)
+            return "feed"
+
+        first = asyncio.create_task(singleflight.do("key", build))
+        await started.wait()
+        second = asyncio.create_task(singleflight.do("key", build))
+        await asyncio.sleep(0)
+        first.cancel()
+        assert await second == "feed"
+        with pytest.raises(asyncio.CancelledError):
+            await first
+
+    asyncio.run(run())
+
+
+def test_errors_reach_every_waiter_and_are_not_kept():
+    async def run():
+        singleflight = SingleFlight()
+        calls = []
+
+        async def build():
+            calls.append(1)
+            await asyncio.sleep(0)
+            raise ConnectionError
+
+        results = await asyncio.gather(*(singleflight.do("key", build) for _ in range(3)), return_exceptions=True)
+        assert [type(_) for _ in results] == [ConnectionError] * 3
+        with pytest.raises(ConnectionError):
+            await singleflight.do("key", build)
+        assert len(calls) == 2  # noqa: PLR2004
+
+        async with singleflight.lock("key") as waited:  # without redis
+            assert waited is False
+
+    asyncio.run(run())
@@ -0,0 +1,96 @@
+import asyncio
+from contextlib import asynccontextmanager
+from types import SimpleNamespace
+from unittest import mock
+import pytest
+from instaloader import ProfileNotExistsException
+from instagram_rss import __main__ as app
+from instagram_rss.state import PROFILE_NOT_EXISTS, SectionIndex, StateStore
+
+USERNAME_DURATION = 30 * 86400
+NOT_FOUND_DURATION = 3600
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def time(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock():
+    clock = Clock()
+    with mock.patch("instagram_rss.state.time", clock):
+        yield clock
+
+
+@pytest.fixture
+def state():
+    return StateStore(":memory:", USERNAME_DURATION, NOT_FOUND_DURATION)
+
+
+def test_resolved_usernames_expire_after_username_duration(clock, state):
+    assert state.get_user_id("user") is None
+    state.set_user_id("User", 123)
+    assert state.get_user_id("user") == "123"
+    assert state.get_user_id("USER") == "123"  # usernames are case-insensitive
+
+    clock.now += USERNAME_DURATION
+    assert state.get_user_id("user") == "123"
+    clock.now += 1
+    assert state.get_user_id("user") is None
+
+
+def test_missing_usernames_expire_after_not_found_duration(clock, state):
+    state.set_user_id("Gone", None)  # Instagram answered that the profile does not exist
+    assert state.get_user_id("gone") == PROFILE_NOT_EXISTS
+    clock.now += NOT_FOUND_DURATION
+    assert state.get_user_id("gone") == PROFILE_NOT_EXISTS
+    clock.now += 1
+    assert state.get_user_id("gone") is None
+
+    state.set_user_id("gone", "456")  # created meanwhile
+    assert state.get_user_id("gone") == "456"
+
+
+def test_sections_are_kept_per_user_and_section(state):
+    assert state.get_section(1, "posts") == SectionIndex(shortcodes=[])
+    state.set_section(1, "posts", SectionIndex(shortcodes=["a", "b"], newest=1000.0))
+    state.set_section("1", "reels", SectionIndex(shortcodes=["c"]))
+    assert state.get_section("1", "posts") == SectionIndex(shortcodes=["a", "b"], newest=1000.0)
+    assert state.get_section(1, "reels") == SectionIndex(shortcodes=["c"])
+    assert state.get_section(2, "posts") == SectionIndex(shortcodes=[])
+
+
+def test_user_id_of_remembers_the_resolutions(clock, state):
+    lookups = []
+
+    def from_username(_context, username):
+        lookups.append(username)
+        if username == "gone":
+            raise ProfileNotExistsException(username)
+        return SimpleNamespace(userid=123)
+
+    @asynccontextmanager
+    async def instaloader_session():
+        yield SimpleNamespace(context=None)
+
+    async def run():
+        assert await app.user_id_of("User") == "123"
+        assert await app.user_id_of("user") == "123"
+        for _ in range(2):
+            with pytest.raises(ProfileNotExistsException):
+                await app.user_id_of("gone")
+        clock.now += NOT_FOUND_DURATION + 1
+        with pytest.raises(ProfileNotExistsException):
+            await app.user_id_of("gone")
+
+    with (
+        mock.patch.object(app, "state", state),
+        mock.patch.object(app, "instaloader_session", instaloader_session),
+        mock.patch.object(app, "Profile", SimpleNamespace(from_username=from_username)),
+    ):
+        asyncio.run(run())
+    assert lookups == ["User", "gone", "gone"]
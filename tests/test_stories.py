@@ -0,0 +1,23 @@
+import asyncio
+import time
+from instagram_rss.stories import StoryPrefetcher
+
+
+def test_prefetch_batches_the_hot_users():
+    batches = []
+
+    async def fetch(user_ids):
+        batches.append(user_ids)
+        if 1 in user_ids:
+            msg = "failed"
+            raise RuntimeError(msg)
+
+    prefetcher = StoryPrefetcher(fetch, interval=60, hot_window=60, batch_size=2)
+    cold = 5
+    for user_id in ("1", "2", "3", 4, cold):
+        prefetcher.touch(user_id)
+    prefetcher.users[cold] = time.time() - 61  # not requested anymore
+
+    asyncio.run(prefetcher.prefetch())
+    assert batches == [[1, 2], [3, 4]]  # a failed batch does not stop the others
+    assert cold not in prefetcher.users
@@ -0,0 +1,90 @@
+import asyncio
+import time
+from unittest import mock
+from instagram_rss.memory_cache import BoundedMemoryCache
+from instagram_rss.tiered_cache import CircuitBreaker, TieredCache
+
+
+class DownCache(BoundedMemoryCache):
+    """A redis that is down: every operation fails."""
+
+    def __init__(self):
+        super().__init__(max_entries=10, max_bytes=1024)
+        self.calls = 0
+
+    async def _get(self, key, encoding="utf-8", _conn=None):  # noqa: ARG002
+        self.calls += 1
+        raise ConnectionError
+
+    async def _set(self, key, value, ttl=None, _cas_token=None, _conn=None):  # noqa: ARG002
+        self.calls += 1
+        raise ConnectionError
+
+
+def make_cache(l2, breaker=None) -> TieredCache:
+    l1 = BoundedMemoryCache(max_entries=10, max_bytes=1024, ttl=3600)
+    return TieredCache(l1, l2, breaker or CircuitBreaker(max_failures=2, cooldown=30), l1_ttl=60, name="feed")
+
+
+def test_reads_through_to_l2():
+    async def run():
+        l2 = BoundedMemoryCache(max_entries=10, max_bytes=1024)
+        await l2.set("key", "value")
+        cache = make_cache(l2)
+        assert await cache.get("key") == "value"
+        await l2.delete("key")
+        assert await cache.get("key") == "value"  # from l1 now
+        assert await cache.multi_get(["key", "missing"]) == ["value", None]
+
+        await cache.set("other", "written")
+        assert await l2.get("other") == "written"
+
+    asyncio.run(run())
+
+
+def test_l2_outage_opens_the_breaker():
+    async def run():
+        l2 = DownCache()
+        breaker = CircuitBreaker(max_failures=2, cooldown=30)
+        cache = make_cache(l2, breaker)
+        await cache.set("key", "value")
+        assert await cache.get("key") == "value"  # the failed write stayed in l1
+        assert await cache.get("missing") is None
+        assert breaker.state == "open"
+
+        calls = l2.calls
+        assert await cache.get("missing") is None
+        await cache.set("other", "value")
+        assert l2.calls == calls  # skipped while open
+        assert await cache.get("other") == "value"
+
+        opened = breaker.opened
+        with mock.patch("time.monotonic", return_value=time.monotonic() + breaker.cooldown):
+            assert breaker.state == "half-open"
+            assert await cache.get("missing") is None
+            assert l2.calls == calls + 1
+            assert breaker.state == "open"  # opened again at the first failure
+        assert breaker.opened == opened + 1
+
+    asyncio.run(run())
+
+
+def test_skip_l1_sees_the_writes_of_other_replicas():
+    async def run():
+        l2 = BoundedMemoryCache(max_entries=10, max_bytes=1024)
+        cache = make_cache(l2)
+        await cache.set("key", "stale")
+        await l2.set("key", "fresh")  # another replica rebuilt it
+        assert await cache.get("key") == "stale"  # its own copy, until l1_ttl
+        assert await cache.get("key", skip_l1=True) == "fresh"
+        assert await cache.get("key") == "fresh"
+
+        await cache.l1.set("local", "only in l1")
+        assert await cache.get("local", skip_l1=True) == "only in l1"
+        assert await make_cache(DownCache()).get("missing", skip_l1=True) is None
+
+        down = make_cache(DownCache())
+        await down.set("key", "value")  # kept in l1 alone
+        assert await down.get("key", skip_l1=True) == "value"
+
+    asyncio.run(run())
@@ -0,0 +1,39 @@
+from email.utils import formatdate
+from unittest import mock
+from instagram_rss.models import CachedFeed
+from instagram_rss.tools import accepted_encodings, is_not_modified
+
+
+def test_last_modified_is_kept_while_the_content_is_the_same():
+    with mock.patch("time.time", return_value=1000.0):
+        feed = CachedFeed.from_content("<feed/>")
+    with mock.patch("time.time", return_value=2000.0):
+        same = CachedFeed.from_content("<feed/>", previous=feed)
+        changed = CachedFeed.from_content("<feed>new</feed>", previous=feed)
+    assert (feed.last_modified, same.last_modified, changed.last_modified) == (1000.0, 1000.0, 2000.0)
+    assert same.built_at == changed.built_at == 2000.0  # noqa: PLR2004
+
+
+def test_is_not_modified():
+    feed = CachedFeed.from_content("<feed/>")
+    feed.last_modified = 1000.0
+    assert is_not_modified({"if-none-match": f'"other", W/"{feed.etag}"'}, feed)
+    assert is_not_modified({"if-none-match": "*"}, feed)
+    assert not is_not_modified({"if-none-match": '"other"'}, feed)
+    # If-None-Match wins over If-Modified-Since
+    assert not is_not_modified({"if-none-match": '"other"', "if-modified-since": formatdate(1000.0)}, feed)
+
+    assert is_not_modified({"if-modified-since": formatdate(1000.0, usegmt=True)}, feed)
+    assert not is_not_modified({"if-modified-since": formatdate(999.0, usegmt=True)}, feed)
+    assert not is_not_modified({"if-modified-since": "yesterday"}, feed)
+    assert not is_not_modified({}, feed)
+    feed.last_modified = None
+    assert not is_not_modified({"if-modified-since": formatdate(1000.0, usegmt=True)}, feed)
+
+
+def test_accepted_encodings():
+    assert accepted_encodings("") == set()
+    assert accepted_encodings("gzip, deflate, br") == {"gzip", "deflate", "br"}
+    assert accepted_encodings("GZIP;q=0.5, br;q=0, identity;q=bad") == {"gzip"}
+    assert accepted_encodings("*") == {"*", "gzip"}
+    assert accepted_encodings("*, gzip;q=0") == {"*"}